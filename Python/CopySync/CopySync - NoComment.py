@@ -6,23 +6,89 @@
 
 import os
 import sys
+import ast
+import argparse
+import errno
 import csv
+import json
 import shutil
+import stat
+import struct
 import hashlib
+import sqlite3
 import time
+import threading
+import queue
+import atexit
+import tempfile
+import ctypes
+import subprocess
+import select
+import tracemalloc
+import re
+from bisect import bisect_left
+from collections import deque
+from contextlib import ExitStack
+from functools import lru_cache
+from enum import IntEnum
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # ============================== IMPORTS ==============================
 # ============================== CONFIGURATION ==============================
 
 SOURCE_DRIVE = r"F:\\"
 TARGET_DRIVE = r"E:\\"
 CHECK_CSV = "CheckComplete.csv"
+CHECK_CSV_FIELDS = ['type', 'path', 'reason', 'size', 'source_path', 'target_path']
 LOG_FILE = "BackupAutomationLog.txt"
 SUMMARY_FILE = "Backup_Summary.txt"
 REMAINING_ISSUES_FILE = "remaining_issues.txt"
+SCAN_INDEX_FILE = "ScanIndex.db"
+HASH_CACHE_FILE = "HashCache.db"
+METRICS_FILE = "Backup_Metrics.json"
+METRICS_PROM_FILE = "Backup_Metrics.prom"
+METRICS_SPEED_BUCKETS = (1, 10, 25, 50, 100, 250, 500, 1000)
+METRICS_SPEED_MIN_SIZE = 1024 * 1024
 
 USE_HASH_COMPARISON = False
+HASH_ALGORITHM = "sha256"
+USE_QUICK_FINGERPRINT = False
+USE_INCREMENTAL_SCAN = False
+INCREMENTAL_FULL_SCAN_DAYS = 7
+STREAMING_PIPELINE = True
+FULL_FINAL_CHECK = False
+VERIFY_COPIED_CONTENT = False
+MIRROR_MODE = False
+MIRROR_DRY_RUN = True
+DETECT_MOVES = False
+MOVE_DETECTION_MIN_SIZE = 1024 * 1024
+MOVE_MTIME_TOLERANCE_NS = 2 * 10**9
+MOVE_VERIFY_FINGERPRINT = True
+USE_DEDUP_STORE = False
+DEDUP_STORE_DIR = ".copysync-objects"
+DEDUP_MIN_SIZE = 64 * 1024
+SNAPSHOT_MODE = False
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_NAME_FORMAT = "%Y-%m-%d_%H%M%S"
+SNAPSHOT_KEEP = 0
+WATCH_MODE = False
+WATCH_SETTLE_SECONDS = 2.0
+WATCH_MAX_DELAY_SECONDS = 30.0
+WATCH_POLL_INTERVAL = 30.0
+WATCH_FULL_SCAN_HOURS = 24
+USE_HASH_CACHE = True
 EXCLUDE_ITEMS = [
     '$RECYCLE.BIN',
     'System Volume Information',
@@ -32,257 +98,2047 @@ EXCLUDE_ITEMS = [
     'desktop.ini'
 ]
 
-HASH_BUFFER_SIZE = 65536
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_WORKERS = 4
+SCAN_WORKERS = 8
+SCAN_QUEUE_SIZE = 1000
+FINGERPRINT_CHUNKS = 8
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+HASH_BENCHMARK_SIZE_MB = 256
+RECORD_BENCHMARK_COUNT = 1000000
+SCAN_BENCHMARK_FILES = 100000
 PROGRESS_INTERVAL_SCAN = 1000
 PROGRESS_INTERVAL_COPY = 10
+PROGRESS_REFRESH_SECONDS = 0.5
+COPY_WORKERS = 8
+LARGE_FILE_WORKERS = 2
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+MAX_COPIES_PER_DEVICE = 8
+COPY_QUEUE_SIZE = 1000
+COPY_ORDER = "auto"
+COPY_SCHEDULE_WINDOW = 5000
+COPY_SCHEDULE_MAX_DELAY = 10.0
+READ_LIMIT_MBPS = 0
+WRITE_LIMIT_MBPS = 0
+LIMIT_SCHEDULE = []
+LOW_PRIORITY = False
+LOW_PRIORITY_NICE = 10
+SMALL_FILE_BATCH_SIZE = 32
+SMALL_FILE_BATCH_BYTES = 16 * 1024 * 1024
+COPY_METHOD = "auto"
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+RESUMABLE_COPY = True
+RESUMABLE_COPY_THRESHOLD = 256 * 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+CHECKPOINT_SUFFIX = ".ckpt"
+USE_DELTA_COPY = True
+DELTA_COPY_THRESHOLD = 64 * 1024 * 1024
+DELTA_BLOCK_SIZE = 256 * 1024
+COPY_BENCHMARK_SIZE_MB = 512
 MAX_DISPLAY_MISSING = 20
 LOG_BACKUP_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
 SUMMARY_LINE_WIDTH = 70
 SUB_LINE_WIDTH = 40
 FILE_ENCODING = "utf-8"
+LOG_BUFFER_SIZE = 1024 * 1024
 
 # ============================== CONFIGURATION ==============================
+# ============================== SHARED STATE ==============================
+
+CONFIG_NAMES = frozenset(name for name in globals() if name.isupper())
+OUTPUT_FILES = ('CHECK_CSV', 'LOG_FILE', 'SUMMARY_FILE', 'REMAINING_ISSUES_FILE', 'SCAN_INDEX_FILE', 'HASH_CACHE_FILE',
+                'METRICS_FILE', 'METRICS_PROM_FILE')
+LOG_LOCK = threading.Lock()
+LOG_QUEUE = queue.Queue()
+LOG_WRITER = None
+DEVICE_SLOTS = {}
+DEVICE_SLOTS_LOCK = threading.Lock()
+DEDUP_LOCKS = [threading.Lock() for _ in range(64)]
+SNAPSHOT_ROOTS = {}
+SNAPSHOT_BASES = {}
+COPY_ABORT = threading.Event()
+SCAN_INDEX = None
+SCAN_INDEX_LOCK = threading.Lock()
+SCAN_INDEX_PREVIOUS = False
+SCAN_INDEX_CUTOFF_NS = 0
+HASH_POOL = None
+HASH_CACHE = None
+HASH_CACHE_LOCK = threading.Lock()
+HASH_CACHE_RUN_ID = 0
+HASH_CACHE_PENDING = 0
+BANDWIDTH_BUCKETS = {'read': {'tokens': 0.0, 'time': 0.0}, 'write': {'tokens': 0.0, 'time': 0.0}}
+BANDWIDTH_LOCK = threading.Lock()
+METRICS = {'counters': {}, 'phases': {}, 'errors': {}, 'copy_speed': {}, 'start_time': time.time()}
+METRICS_LOCK = threading.Lock()
+
+# ============================== SHARED STATE ==============================
+# ============================== DISCREPANCY RECORDS ==============================
+
+class Reason(IntEnum):
+    DIRECTORY_MISSING = 1
+    FILE_MISSING = 2
+    SIZE_MISMATCH = 3
+    HASH_MISMATCH = 4
+    FINGERPRINT_MISMATCH = 5
+    COMPARISON_ERROR = 6
+    ORPHANED_FILE = 7
+    ORPHANED_DIRECTORY = 8
+    MOVED = 9
+    UNREADABLE_SOURCE = 10
+
+class MissingItem(NamedTuple):
+    path: str
+    reason: Reason
+    size: int = 0
+    detail: object = None
+    target: int = 0
+    
+    @property
+    def type(self):
+        return 'directory' if self.reason in (Reason.DIRECTORY_MISSING, Reason.ORPHANED_DIRECTORY,
+                                              Reason.UNREADABLE_SOURCE) else 'file'
+    
+    @property
+    def orphaned(self):
+        return self.reason in (Reason.ORPHANED_FILE, Reason.ORPHANED_DIRECTORY)
+    
+    @property
+    def source_path(self):
+        return os.path.join(SOURCE_DRIVE, self.path)
+    
+    @property
+    def target_drive(self):
+        return get_target_drives()[self.target]
+    
+    @property
+    def target_path(self):
+        return os.path.join(self.target_drive, self.path)
+    
+    def describe(self):
+        if self.reason == Reason.SIZE_MISMATCH:
+            return f'Size mismatch ({self.size} vs {self.detail} bytes)'
+        if self.reason == Reason.COMPARISON_ERROR:
+            return f'Error during comparison: {self.detail}'
+        if self.reason == Reason.MOVED:
+            return f'Moved on source (from {self.detail})'
+        return REASON_TEXTS[self.reason]
+    
+    def to_csv_row(self):
+        return {
+            'type': self.type,
+            'path': self.path,
+            'reason': self.describe(),
+            'size': self.size if self.type == 'file' else '',
+            'source_path': self.source_path,
+            'target_path': self.target_path
+        }
+
+REASON_TEXTS = {
+    Reason.DIRECTORY_MISSING: 'Directory missing',
+    Reason.FILE_MISSING: 'File missing',
+    Reason.HASH_MISMATCH: 'Content mismatch (hash)',
+    Reason.FINGERPRINT_MISMATCH: 'Content mismatch (fingerprint)',
+    Reason.ORPHANED_FILE: 'Only on target',
+    Reason.ORPHANED_DIRECTORY: 'Only on target',
+    Reason.UNREADABLE_SOURCE: 'Source directory cannot be read'
+}
+
+def item_from_csv_row(row):
+    target = next((index for index, drive in enumerate(get_target_drives())
+                   if row['target_path'] == os.path.join(drive, row['path'])), 0)
+    
+    if row['reason'] == REASON_TEXTS[Reason.ORPHANED_FILE]:
+        reason = Reason.ORPHANED_DIRECTORY if row['type'] == 'directory' else Reason.ORPHANED_FILE
+        return MissingItem(row['path'], reason, int(row['size'] or 0), target=target)
+    if row['reason'] == REASON_TEXTS[Reason.UNREADABLE_SOURCE]:
+        return MissingItem(row['path'], Reason.UNREADABLE_SOURCE, target=target)
+    if row['type'] == 'directory':
+        return MissingItem(row['path'], Reason.DIRECTORY_MISSING, target=target)
+    return MissingItem(row['path'], Reason.FILE_MISSING, int(row['size'] or 0), target=target)
+
+# ============================== DISCREPANCY RECORDS ==============================
 # ============================== HELPER FUNCTIONS ==============================
 
 def log_message(message, print_also=True):
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     log_entry = f"[{timestamp}] {message}"
     
-    with open(LOG_FILE, 'a', encoding=FILE_ENCODING) as log:
-        log.write(log_entry + "\n")
+    start_log_writer()
+    LOG_QUEUE.put(log_entry)
     
     if print_also:
-        print(message)
+        with LOG_LOCK:
+            print(message)
+
+def write_log_queue(log_file):
+    with open(log_file, 'a', encoding=FILE_ENCODING, buffering=LOG_BUFFER_SIZE) as log:
+        while True:
+            entry = LOG_QUEUE.get()
+            
+            batch = []
+            while entry is not None:
+                batch.append(entry)
+                try:
+                    entry = LOG_QUEUE.get_nowait()
+                except queue.Empty:
+                    break
+            
+            start = time.perf_counter()
+            if batch:
+                log.write("\n".join(batch) + "\n")
+            
+            if entry is None:
+                return
+            log.flush()
+            add_metric('log_seconds', time.perf_counter() - start)
+
+def start_log_writer():
+    global LOG_WRITER
+    
+    if LOG_WRITER is not None and LOG_WRITER.is_alive():
+        return
+    
+    with LOG_LOCK:
+        if LOG_WRITER is None or not LOG_WRITER.is_alive():
+            LOG_WRITER = threading.Thread(target=write_log_queue, args=(LOG_FILE,), daemon=True)
+            LOG_WRITER.start()
+
+def stop_log_writer():
+    global LOG_WRITER
+    
+    if LOG_WRITER is None:
+        return
+    
+    LOG_QUEUE.put(None)
+    LOG_WRITER.join()
+    LOG_WRITER = None
+
+def new_hasher(algorithm):
+    if algorithm.startswith("xxh"):
+        if xxhash is None:
+            raise ValueError(f"Hash algorithm {algorithm} requires the xxhash package")
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
 
-def get_file_hash(file_path, buffer_size=HASH_BUFFER_SIZE):
-    sha256 = hashlib.sha256()
+def get_file_hash(file_path, algorithm=None, buffer_size=None):
+    start = time.perf_counter()
+    hashed = 0
     try:
-        with open(file_path, 'rb') as f:
+        hasher = new_hasher(algorithm or HASH_ALGORITHM)
+        buffer = bytearray(buffer_size or HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        with open(file_path, 'rb', buffering=0) as f:
             while True:
-                data = f.read(buffer_size)
-                if not data:
+                size = f.readinto(buffer)
+                if not size:
                     break
-                sha256.update(data)
-        return sha256.hexdigest()
-    except Exception:
+                hasher.update(view[:size])
+                hashed += size
+                limit_bandwidth(size)
+        return hasher.hexdigest()
+    except Exception as e:
+        record_error(e)
+        return None
+    finally:
+        add_hash_metrics(hashed, time.perf_counter() - start)
+
+def get_file_fingerprint(file_path, file_size, algorithm=None, chunk_size=None):
+    chunk_size = chunk_size or FINGERPRINT_CHUNK_SIZE
+    
+    if file_size <= (FINGERPRINT_CHUNKS + 2) * chunk_size:
+        return get_file_hash(file_path, algorithm)
+    
+    start = time.perf_counter()
+    hashed = 0
+    try:
+        hasher = new_hasher(algorithm or HASH_ALGORITHM)
+        hasher.update(str(file_size).encode())
+        
+        last_offset = file_size - chunk_size
+        offsets = [0]
+        offsets += [last_offset * i // (FINGERPRINT_CHUNKS + 1) for i in range(1, FINGERPRINT_CHUNKS + 1)]
+        offsets.append(last_offset)
+        
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(file_path, 'rb', buffering=0) as f:
+            for offset in offsets:
+                f.seek(offset)
+                size = f.readinto(buffer)
+                hasher.update(view[:size])
+                hashed += size
+                limit_bandwidth(size)
+        return hasher.hexdigest()
+    except Exception as e:
+        record_error(e)
+        return None
+    finally:
+        add_hash_metrics(hashed, time.perf_counter() - start)
+
+def get_content_check_label():
+    if USE_HASH_COMPARISON:
+        return f"full hash ({HASH_ALGORITHM})"
+    if USE_QUICK_FINGERPRINT:
+        return f"quick fingerprint ({HASH_ALGORITHM}, {FINGERPRINT_CHUNKS + 2} x {FINGERPRINT_CHUNK_SIZE // 1024} KB)"
+    return None
+
+def check_hash_algorithm():
+    global HASH_ALGORITHM
+    
+    try:
+        new_hasher(HASH_ALGORITHM)
+    except ValueError as e:
+        log_message(f"⚠️ {str(e)} - falling back to blake2b")
+        HASH_ALGORITHM = "blake2b"
+
+def translate_exclude_pattern(pattern):
+    if pattern.startswith("!"):
+        raise ValueError(f"Negated exclude patterns are not supported: {pattern}")
+    
+    anchored = "/" in pattern.rstrip("/")
+    directory_only = pattern.endswith("/")
+    pattern = pattern.strip("/")
+    name_only = not anchored and "**" not in pattern
+    
+    parts = [] if anchored or name_only else ["(?:.*/)?"]
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            parts.append("(?:/.*)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            char_class = pattern[i + 1:end].replace("\\", "\\\\")
+            parts.append("[^" + char_class[1:] + "]" if char_class.startswith("!") else "[" + char_class + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    
+    parts.append("/" if directory_only else "/?")
+    return "".join(parts), name_only
+
+@lru_cache(maxsize=8)
+def compile_exclude_patterns(patterns):
+    name_expressions, path_expressions = [], []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if pattern and not pattern.startswith("#"):
+            expression, name_only = translate_exclude_pattern(pattern)
+            (name_expressions if name_only else path_expressions).append(f"(?:{expression})")
+    
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    return tuple(re.compile("|".join(expressions), flags).fullmatch if expressions else None
+                 for expressions in (name_expressions, path_expressions))
+
+def is_excluded(relative_path, is_directory):
+    match_name, match_path = compile_exclude_patterns(tuple(EXCLUDE_ITEMS))
+    path = relative_path.replace(os.sep, "/")
+    suffix = "/" if is_directory else ""
+    return bool((match_name and match_name(path.rpartition("/")[2] + suffix))
+                or (match_path and match_path(path + suffix)))
+
+def scan_directory(directory, relative_dir=""):
+    match_name, match_path = compile_exclude_patterns(tuple(EXCLUDE_ITEMS))
+    prefix = relative_dir.replace(os.sep, "/") + "/" if relative_dir else ""
+    
+    def excluded(entry):
+        suffix = "/" if entry.is_dir() else ""
+        return bool((match_name and match_name(entry.name + suffix)) or (match_path and match_path(prefix + entry.name + suffix)))
+    
+    add_metric('directories_listed')
+    try:
+        with os.scandir(directory) as entries:
+            if match_name is None and match_path is None:
+                return {entry.name: entry for entry in entries}
+            return {entry.name: entry for entry in entries if not excluded(entry)}
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        record_error(e)
+        log_message(f"⚠️ Cannot read directory {directory}: {str(e)}", print_also=False)
         return None
 
+def get_device_slot(path):
+    try:
+        device = os.stat(path).st_dev
+    except OSError:
+        device = None
+    
+    with DEVICE_SLOTS_LOCK:
+        if device not in DEVICE_SLOTS:
+            DEVICE_SLOTS[device] = threading.BoundedSemaphore(MAX_COPIES_PER_DEVICE)
+        return DEVICE_SLOTS[device]
+
+def get_configured_target_drives():
+    return list(TARGET_DRIVE) if isinstance(TARGET_DRIVE, (list, tuple)) else [TARGET_DRIVE]
+
+def get_target_drives():
+    return [SNAPSHOT_ROOTS.get(target_drive, target_drive) for target_drive in get_configured_target_drives()]
+
+def is_mirroring():
+    return MIRROR_MODE or SNAPSHOT_MODE
+
+def is_mirror_dry_run():
+    return MIRROR_DRY_RUN and not SNAPSHOT_MODE
+
 def print_header(title):
     print("\n" + "="*SUMMARY_LINE_WIDTH)
     print(f" {title}")
     print("="*SUMMARY_LINE_WIDTH)
 
 # ============================== HELPER FUNCTIONS ==============================
-# ============================== STEP 1: PERFORM COMPLETE COMPARISON ==============================
+# ============================== BANDWIDTH LIMIT ==============================
+
+def parse_clock_time(value):
+    parsed = time.strptime(value.strip(), "%H:%M")
+    return parsed.tm_hour * 60 + parsed.tm_min
 
-def perform_complete_comparison():
+@lru_cache(maxsize=8)
+def parse_limit_schedule(schedule):
+    return tuple((parse_clock_time(start), parse_clock_time(end)) for start, end in schedule)
+
+def get_bandwidth_limits():
+    if LIMIT_SCHEDULE:
+        now = time.localtime()
+        now = now.tm_hour * 60 + now.tm_min
+        if not any(start <= now < end if start <= end else (now >= start or now < end)
+                   for start, end in parse_limit_schedule(tuple(map(tuple, LIMIT_SCHEDULE)))):
+            return 0, 0
+    return READ_LIMIT_MBPS * 1024 * 1024, WRITE_LIMIT_MBPS * 1024 * 1024
+
+def take_tokens(bucket, rate, amount):
+    if not rate or not amount:
+        return 0
     
-    print_header("STEP 1: COMPARE ALL FILES AND FOLDERS")
-    log_message("START: Complete comparison")
+    with BANDWIDTH_LOCK:
+        now = time.monotonic()
+        bucket['tokens'] = min(rate, bucket['tokens'] + (now - bucket['time']) * rate)
+        bucket['time'] = now
+        bucket['tokens'] -= amount
+        return -bucket['tokens'] / rate if bucket['tokens'] < 0 else 0
+
+def limit_bandwidth(read_bytes, write_bytes=0):
+    if not (READ_LIMIT_MBPS or WRITE_LIMIT_MBPS):
+        return
     
-    source_path = Path(SOURCE_DRIVE)
-    target_path = Path(TARGET_DRIVE)
+    read_rate, write_rate = get_bandwidth_limits()
+    delay = max(take_tokens(BANDWIDTH_BUCKETS['read'], read_rate, read_bytes),
+                take_tokens(BANDWIDTH_BUCKETS['write'], write_rate, write_bytes))
+    if delay:
+        COPY_ABORT.wait(delay)
+        add_metric('throttle_seconds', delay)
+
+def get_throttled_chunk_size(chunk_size):
+    if not (READ_LIMIT_MBPS or WRITE_LIMIT_MBPS):
+        return chunk_size
+    return min([chunk_size] + [max(int(rate) // 10, 64 * 1024) for rate in get_bandwidth_limits() if rate])
+
+def lower_process_priority():
+    try:
+        if os.name == "nt":
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), 0x00100000)
+        else:
+            os.setpriority(os.PRIO_PROCESS, 0, LOW_PRIORITY_NICE)
+            if shutil.which("ionice"):
+                subprocess.run(["ionice", "-c", "3", "-p", str(os.getpid())], capture_output=True, check=False)
+        log_message("Process priority lowered (background mode)")
+    except (OSError, AttributeError) as e:
+        log_message(f"⚠️ Could not lower the process priority: {str(e)}")
+
+# ============================== BANDWIDTH LIMIT ==============================
+# ============================== METRICS ==============================
+
+COPY_METRICS = ('files_copied', 'files_skipped', 'directories_created', 'files_moved', 'orphans_deleted',
+                'delta_files', 'dedup_linked', 'errors')
+
+def reset_metrics():
+    with METRICS_LOCK:
+        METRICS.update({'counters': {}, 'phases': {}, 'errors': {}, 'copy_speed': {}, 'start_time': time.time()})
+
+def add_metric(name, value=1):
+    with METRICS_LOCK:
+        METRICS['counters'][name] = METRICS['counters'].get(name, 0) + value
+
+def add_hash_metrics(size, seconds):
+    with METRICS_LOCK:
+        counters = METRICS['counters']
+        counters['hash_files'] = counters.get('hash_files', 0) + 1
+        counters['hash_bytes'] = counters.get('hash_bytes', 0) + size
+        counters['hash_seconds'] = counters.get('hash_seconds', 0) + seconds
+
+def add_copy_metrics(stats):
+    with METRICS_LOCK:
+        counters = METRICS['counters']
+        for name in COPY_METRICS:
+            counters[f"copy_{name}"] = counters.get(f"copy_{name}", 0) + stats[name]
+        counters['copy_bytes'] = counters.get('copy_bytes', 0) + stats['total_bytes']
+        counters['copy_wall_seconds'] = counters.get('copy_wall_seconds', 0) + time.time() - stats['start_time']
+
+def record_error(error):
+    name = type(error).__name__
+    with METRICS_LOCK:
+        METRICS['errors'][name] = METRICS['errors'].get(name, 0) + 1
+
+def observe_copy_speed(size, seconds):
+    if size < METRICS_SPEED_MIN_SIZE or seconds <= 0:
+        return
     
-    if not source_path.exists():
-        log_message(f"❌ ERROR: Source path does not exist: {SOURCE_DRIVE}")
-        return []
+    speed = size / seconds / 1024**2
+    index = bisect_left(METRICS_SPEED_BUCKETS, speed)
+    bound = METRICS_SPEED_BUCKETS[index] if index < len(METRICS_SPEED_BUCKETS) else float('inf')
+    with METRICS_LOCK:
+        METRICS['copy_speed'][bound] = METRICS['copy_speed'].get(bound, 0) + 1
+        METRICS['counters']['copy_speed_sum'] = METRICS['counters'].get('copy_speed_sum', 0) + speed
+
+def record_phase(name, start_time):
+    now = time.time()
+    with METRICS_LOCK:
+        METRICS['phases'][name] = now - start_time
+    return now
+
+def build_metrics(scan_stats, success):
+    with METRICS_LOCK:
+        counters = dict(METRICS['counters'])
+        phases = dict(METRICS['phases'])
+        errors = dict(sorted(METRICS['errors'].items()))
+        copy_speed = dict(METRICS['copy_speed'])
+        start_time = METRICS['start_time']
     
-    if not target_path.exists():
-        log_message(f"❌ ERROR: Target path does not exist: {TARGET_DRIVE}")
-        return []
+    def rate(amount, seconds):
+        return round(amount / seconds, 1) if seconds > 0 else 0.0
     
-    missing_items = []
-    total_scanned = 0
-    start_time = time.time()
+    scan_seconds = counters.get('scan_seconds', 0)
+    copy_seconds = counters.get('copy_wall_seconds', 0)
     
-    log_message(f"Source: {SOURCE_DRIVE}")
-    log_message(f"Target: {TARGET_DRIVE}")
-    log_message(f"Hash comparison: {'YES' if USE_HASH_COMPARISON else 'NO'}")
+    buckets = {}
+    total = 0
+    for bound in (*METRICS_SPEED_BUCKETS, float('inf')):
+        total += copy_speed.get(bound, 0)
+        buckets["+Inf" if bound == float('inf') else str(bound)] = total
     
-    print(f"Scanning source directory...")
+    return {
+        'run': {
+            'start': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(start_time)),
+            'end': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'timestamp': round(time.time(), 3),
+            'success': success,
+            'source': SOURCE_DRIVE,
+            'targets': get_target_drives(),
+            'content_check': get_content_check_label() or None,
+            'streaming': STREAMING_PIPELINE
+        },
+        'phase_seconds': {name: round(seconds, 3) for name, seconds in phases.items()},
+        'scan': {
+            'seconds': round(scan_seconds, 3),
+            'entries': scan_stats['scanned'],
+            'entries_per_second': rate(scan_stats['scanned'], scan_seconds),
+            'directories_listed': counters.get('directories_listed', 0),
+            'directories_reused': counters.get('directories_reused', 0),
+            'stat_calls': counters.get('stat_calls', 0),
+            'missing_directories': scan_stats['directories'],
+            'missing_files': scan_stats['files'],
+            'target_only': scan_stats['orphans'],
+            'moves': scan_stats['moves']
+        },
+        'copy': {
+            'seconds': round(copy_seconds, 3),
+            'bytes': counters.get('copy_bytes', 0),
+            'mb_per_second': rate(counters.get('copy_bytes', 0) / 1024**2, copy_seconds),
+            **{name: counters.get(f"copy_{name}", 0) for name in COPY_METRICS}
+        },
+        'hash': {
+            'files': counters.get('hash_files', 0),
+            'bytes': counters.get('hash_bytes', 0),
+            'mb_per_second': rate(counters.get('hash_bytes', 0) / 1024**2, counters.get('hash_seconds', 0))
+        },
+        'final_check': {
+            'items': counters.get('final_check_items', 0),
+            'remaining': counters.get('final_check_remaining', 0)
+        },
+        'thread_seconds': {
+            'hashing': round(counters.get('hash_seconds', 0), 3),
+            'copying': round(counters.get('copy_seconds', 0), 3),
+            'logging': round(counters.get('log_seconds', 0), 3),
+            'throttled': round(counters.get('throttle_seconds', 0), 3)
+        },
+        'copy_speed_mb_per_second': {
+            'buckets': buckets,
+            'count': total,
+            'sum': round(counters.get('copy_speed_sum', 0), 3)
+        },
+        'errors': errors
+    }
+
+def format_prometheus_metrics(metrics):
+    lines = []
     
-    for root, dirs, files in os.walk(SOURCE_DRIVE):
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_ITEMS]
+    def label(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    
+    def add(name, samples, metric_type="gauge"):
+        lines.append(f"# TYPE copysync_{name} {metric_type}")
+        for labels, value in samples:
+            number = repr(value) if isinstance(value, float) else int(value)
+            lines.append(f"copysync_{name}{labels} {number}")
+    
+    run = metrics['run']
+    add("run_info", [(f'{{source="{label(run["source"])}",target="{label(", ".join(run["targets"]))}"}}', 1)])
+    add("last_run_timestamp_seconds", [("", float(run['timestamp']))])
+    add("last_run_success", [("", run['success'])])
+    add("phase_seconds", [(f'{{phase="{name}"}}', float(seconds)) for name, seconds in metrics['phase_seconds'].items()])
+    
+    for section in ('scan', 'copy', 'hash', 'final_check'):
+        for name, value in metrics[section].items():
+            add(f"{section}_{name}", [("", value)])
+    
+    add("thread_seconds", [(f'{{activity="{name}"}}', float(seconds)) for name, seconds in metrics['thread_seconds'].items()])
+    add("errors", [(f'{{class="{name}"}}', count) for name, count in metrics['errors'].items()])
+    
+    histogram = metrics['copy_speed_mb_per_second']
+    lines.append("# TYPE copysync_copy_speed_mb_per_second histogram")
+    for bound, count in histogram['buckets'].items():
+        lines.append(f'copysync_copy_speed_mb_per_second_bucket{{le="{bound}"}} {count}')
+    lines.append(f"copysync_copy_speed_mb_per_second_sum {float(histogram['sum'])!r}")
+    lines.append(f"copysync_copy_speed_mb_per_second_count {histogram['count']}")
+    
+    return "\n".join(lines) + "\n"
+
+def write_metrics(scan_stats, success):
+    metrics = build_metrics(scan_stats, success)
+    outputs = ((METRICS_FILE, lambda: json.dumps(metrics, indent=2, ensure_ascii=False) + "\n"),
+               (METRICS_PROM_FILE, lambda: format_prometheus_metrics(metrics)))
+    
+    for file_name, render in outputs:
+        if not file_name:
+            continue
+        temp_file = f"{file_name}.tmp"
+        try:
+            with open(temp_file, 'w', encoding=FILE_ENCODING) as f:
+                f.write(render())
+            os.replace(temp_file, file_name)
+        except OSError as e:
+            log_message(f"⚠️ Could not write metrics to {file_name}: {str(e)}")
+    
+    log_message(f"Metrics written: {', '.join(name for name in (METRICS_FILE, METRICS_PROM_FILE) if name)}", print_also=False)
+
+# ============================== METRICS ==============================
+# ============================== SCAN INDEX ==============================
+
+def open_scan_index():
+    global SCAN_INDEX, SCAN_INDEX_PREVIOUS, SCAN_INDEX_CUTOFF_NS
+    
+    new_index = SCAN_INDEX_FILE + ".tmp"
+    if os.path.exists(new_index):
+        os.remove(new_index)
+    
+    SCAN_INDEX = sqlite3.connect(new_index, check_same_thread=False)
+    SCAN_INDEX.executescript("""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE directories (path TEXT PRIMARY KEY, parent TEXT, source_mtime INTEGER,
+                                  target_mtime INTEGER, entry_count INTEGER);
+        CREATE TABLE files (path TEXT PRIMARY KEY, parent TEXT, size INTEGER, mtime INTEGER, hash TEXT);
+        CREATE INDEX directories_parent ON directories(parent);
+        CREATE INDEX files_parent ON files(parent);
+    """)
+    target_drives = get_configured_target_drives()
+    snapshots = "|".join(os.path.basename(SNAPSHOT_ROOTS.get(drive, "")) for drive in target_drives)
+    SCAN_INDEX.executemany("INSERT INTO meta VALUES (?, ?)",
+                           [('source', SOURCE_DRIVE), ('target', "|".join(target_drives)),
+                            ('exclude', "\n".join(EXCLUDE_ITEMS)), ('snapshot', snapshots)])
+    SCAN_INDEX.commit()
+    
+    SCAN_INDEX_CUTOFF_NS = time.time_ns() - 2 * 10**9
+    SCAN_INDEX_PREVIOUS = False
+    meta = {}
+    
+    if os.path.exists(SCAN_INDEX_FILE):
+        SCAN_INDEX.execute("ATTACH DATABASE ? AS previous", (SCAN_INDEX_FILE,))
+        try:
+            meta = dict(SCAN_INDEX.execute("SELECT key, value FROM previous.meta"))
+        except sqlite3.DatabaseError:
+            meta = {}
         
-        current_path = Path(root)
-        relative_path = current_path.relative_to(source_path)
+        if meta.get('source') != SOURCE_DRIVE or meta.get('target') != "|".join(target_drives):
+            SCAN_INDEX.execute("DETACH DATABASE previous")
+            log_message("Scan index belongs to other drives - performing a full scan")
+        elif SNAPSHOT_MODE and meta.get('snapshot') != "|".join(SNAPSHOT_BASES.get(drive, "?") for drive in target_drives):
+            SCAN_INDEX.execute("DETACH DATABASE previous")
+            log_message("Snapshot is not a clone of the indexed snapshot - performing a full scan")
+        elif meta.get('exclude') != "\n".join(EXCLUDE_ITEMS):
+            SCAN_INDEX.execute("DETACH DATABASE previous")
+            log_message("Exclude patterns changed - performing a full scan")
+        elif INCREMENTAL_FULL_SCAN_DAYS and time.time() - float(meta.get('full_scan') or 0) >= INCREMENTAL_FULL_SCAN_DAYS * 86400:
+            SCAN_INDEX.execute("DETACH DATABASE previous")
+            log_message(f"Last full scan is older than {INCREMENTAL_FULL_SCAN_DAYS:g} days - performing a full scan")
+        else:
+            log_message(f"Incremental scan using index: {SCAN_INDEX_FILE}")
+            SCAN_INDEX_PREVIOUS = True
+    
+    full_scan = meta.get('full_scan') if SCAN_INDEX_PREVIOUS else str(time.time())
+    SCAN_INDEX.execute("INSERT INTO meta VALUES ('full_scan', ?)", (full_scan,))
+
+def reuse_indexed_directory(relative_dir, source_mtime, target_mtime):
+    if not SCAN_INDEX_PREVIOUS or source_mtime is None or target_mtime is None:
+        return None
+    
+    with SCAN_INDEX_LOCK:
+        row = SCAN_INDEX.execute(
+            "SELECT source_mtime, target_mtime, entry_count FROM previous.directories WHERE path = ?",
+            (relative_dir,)).fetchone()
         
-        for dir_name in dirs:
-            if dir_name in EXCLUDE_ITEMS:
+        if row is None or row[0] != source_mtime or (row[1] != target_mtime and not SNAPSHOT_MODE):
+            return None
+        
+        SCAN_INDEX.execute("INSERT INTO directories SELECT * FROM previous.directories WHERE path = ?",
+                           (relative_dir,))
+        SCAN_INDEX.execute("INSERT INTO files SELECT * FROM previous.files WHERE parent = ?",
+                           (relative_dir,))
+        subdirectories = [path for (path,) in SCAN_INDEX.execute(
+            "SELECT path FROM previous.directories WHERE parent = ?", (relative_dir,))]
+    
+    return subdirectories, row[2]
+
+def record_directory(relative_dir, source_mtime, target_mtime, entry_count, files):
+    parent = os.path.dirname(relative_dir) if relative_dir else None
+    
+    if source_mtime is not None and source_mtime >= SCAN_INDEX_CUTOFF_NS:
+        source_mtime = None
+    if target_mtime is not None and target_mtime >= SCAN_INDEX_CUTOFF_NS:
+        target_mtime = None
+    
+    with SCAN_INDEX_LOCK:
+        SCAN_INDEX.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?)",
+                           (relative_dir, parent, source_mtime, target_mtime, entry_count))
+        SCAN_INDEX.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                               [(path, relative_dir, size, mtime, file_hash)
+                                for path, size, mtime, file_hash in files])
+
+def update_indexed_hash(relative_path, file_hash):
+    with SCAN_INDEX_LOCK:
+        SCAN_INDEX.execute("UPDATE files SET hash = ? WHERE path = ?", (file_hash, relative_path))
+
+def invalidate_indexed_directory(relative_dir):
+    with SCAN_INDEX_LOCK:
+        SCAN_INDEX.execute("UPDATE directories SET source_mtime = NULL, target_mtime = NULL WHERE path = ?",
+                           (relative_dir,))
+
+def close_scan_index(success):
+    global SCAN_INDEX, SCAN_INDEX_PREVIOUS
+    
+    if SCAN_INDEX is None:
+        return
+    
+    with SCAN_INDEX_LOCK:
+        SCAN_INDEX.commit()
+        SCAN_INDEX.close()
+        SCAN_INDEX = None
+        SCAN_INDEX_PREVIOUS = False
+    
+    new_index = SCAN_INDEX_FILE + ".tmp"
+    if success:
+        os.replace(new_index, SCAN_INDEX_FILE)
+        log_message(f"Scan index saved: {SCAN_INDEX_FILE}", print_also=False)
+    else:
+        os.remove(new_index)
+        log_message("Scan index discarded - next run performs a full scan of changed directories", print_also=False)
+
+def get_mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+# ============================== SCAN INDEX ==============================
+# ============================== HASH CACHE ==============================
+
+def open_hash_cache():
+    global HASH_CACHE, HASH_CACHE_RUN_ID, HASH_CACHE_PENDING
+    
+    HASH_CACHE = sqlite3.connect(HASH_CACHE_FILE, check_same_thread=False)
+    HASH_CACHE.execute("""
+        CREATE TABLE IF NOT EXISTS hashes (path TEXT, algorithm TEXT, size INTEGER, mtime INTEGER,
+                                           digest TEXT, seen INTEGER, PRIMARY KEY (path, algorithm))
+    """)
+    HASH_CACHE_RUN_ID = time.time_ns()
+    HASH_CACHE_PENDING = 0
+    log_message(f"Hash cache: {HASH_CACHE_FILE}", print_also=False)
+
+def get_hash_cache_path(file_path):
+    file_path = str(file_path)
+    for target_drive, snapshot_root in SNAPSHOT_ROOTS.items():
+        if file_path.startswith(snapshot_root + os.sep):
+            return os.path.join(target_drive, SNAPSHOT_DIR, "*", file_path[len(snapshot_root) + 1:])
+    return file_path
+
+def get_cached_hash(file_path, file_stat, algorithm=None, fingerprint=False, refresh=False):
+    global HASH_CACHE_PENDING
+    
+    algorithm = algorithm or HASH_ALGORITHM
+    if fingerprint:
+        cache_key = f"{algorithm}:fp{FINGERPRINT_CHUNKS}x{FINGERPRINT_CHUNK_SIZE}"
+        compute = lambda: get_file_fingerprint(file_path, file_stat.st_size, algorithm)
+    else:
+        cache_key = algorithm
+        compute = lambda: get_file_hash(file_path, algorithm)
+    
+    if HASH_CACHE is None:
+        return compute()
+    
+    cache_path = get_hash_cache_path(file_path)
+    with HASH_CACHE_LOCK:
+        row = HASH_CACHE.execute("SELECT size, mtime, digest FROM hashes WHERE path = ? AND algorithm = ?",
+                                 (cache_path, cache_key)).fetchone()
+        
+        if not refresh and row is not None and row[0] == file_stat.st_size and row[1] == file_stat.st_mtime_ns:
+            HASH_CACHE.execute("UPDATE hashes SET seen = ? WHERE path = ? AND algorithm = ?",
+                               (HASH_CACHE_RUN_ID, cache_path, cache_key))
+            return row[2]
+    
+    digest = compute()
+    if digest is None:
+        return None
+    
+    with HASH_CACHE_LOCK:
+        HASH_CACHE.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                           (cache_path, cache_key, file_stat.st_size, file_stat.st_mtime_ns,
+                            digest, HASH_CACHE_RUN_ID))
+        HASH_CACHE_PENDING += 1
+        if HASH_CACHE_PENDING >= 1000:
+            HASH_CACHE.commit()
+            HASH_CACHE_PENDING = 0
+    
+    return digest
+
+def forget_cached_hash(file_path):
+    global HASH_CACHE_PENDING
+    
+    if HASH_CACHE is None:
+        return
+    
+    with HASH_CACHE_LOCK:
+        HASH_CACHE.execute("DELETE FROM hashes WHERE path = ?", (get_hash_cache_path(file_path),))
+        HASH_CACHE_PENDING += 1
+
+def evict_hash_cache():
+    if HASH_CACHE is None:
+        return
+    
+    with HASH_CACHE_LOCK:
+        evicted = HASH_CACHE.execute("DELETE FROM hashes WHERE seen < ?", (HASH_CACHE_RUN_ID,)).rowcount
+        HASH_CACHE.commit()
+    
+    log_message(f"Hash cache: {evicted} stale entries evicted", print_also=False)
+
+def close_hash_cache():
+    global HASH_CACHE
+    
+    if HASH_CACHE is None:
+        return
+    
+    with HASH_CACHE_LOCK:
+        HASH_CACHE.commit()
+        HASH_CACHE.close()
+        HASH_CACHE = None
+
+# ============================== HASH CACHE ==============================
+# ============================== MOVE DETECTION ==============================
+
+def new_move_index():
+    return {
+        'candidates': [{} for _ in get_target_drives()],
+        'missing': [],
+        'orphans': [],
+        'moved_from': set()
+    }
+
+def add_move_candidates(moves, target, relative_path, is_directory):
+    candidates = moves['candidates'][target]
+    target_drive = get_target_drives()[target]
+    
+    if not is_directory:
+        try:
+            file_stat = os.stat(os.path.join(target_drive, relative_path), follow_symlinks=False)
+        except OSError:
+            return
+        if stat.S_ISREG(file_stat.st_mode) and file_stat.st_size >= MOVE_DETECTION_MIN_SIZE:
+            candidates.setdefault(file_stat.st_size, []).append((file_stat.st_mtime_ns, relative_path))
+        return
+    
+    pending = [relative_path]
+    while pending:
+        relative_dir = pending.pop()
+        for name, entry in (scan_directory(os.path.join(target_drive, relative_dir), relative_dir) or {}).items():
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(os.path.join(relative_dir, name))
+                elif entry.is_file(follow_symlinks=False):
+                    file_stat = entry.stat(follow_symlinks=False)
+                    if file_stat.st_size >= MOVE_DETECTION_MIN_SIZE:
+                        candidates.setdefault(file_stat.st_size, []).append(
+                            (file_stat.st_mtime_ns, os.path.join(relative_dir, name)))
+            except OSError:
                 continue
-                
-            source_dir = source_path / relative_path / dir_name
-            target_dir = target_path / relative_path / dir_name
-            
-            if not target_dir.exists():
-                missing_items.append({
-                    'type': 'directory',
-                    'path': str(relative_path / dir_name),
-                    'source_path': str(source_dir),
-                    'target_path': str(target_dir),
-                    'reason': 'Directory missing'
-                })
-            
-            total_scanned += 1
+
+def defer_for_move(moves, problem):
+    if problem.reason == Reason.FILE_MISSING and problem.size >= MOVE_DETECTION_MIN_SIZE:
+        moves['missing'].append(problem)
+        return True
+    
+    if not problem.orphaned:
+        return False
+    
+    if os.path.lexists(problem.source_path):
+        return not is_mirroring()
+    
+    add_move_candidates(moves, problem.target, problem.path, problem.type == 'directory')
+    if is_mirroring():
+        moves['orphans'].append(problem)
+    return True
+
+def find_moved_file(moves, item):
+    entries = moves['candidates'][item.target].get(item.size)
+    if not entries:
+        return None
+    
+    try:
+        source_mtime = os.stat(item.source_path).st_mtime_ns
+    except OSError:
+        return None
+    
+    source_fingerprint = None
+    for index, (mtime_ns, old_path) in enumerate(entries):
+        if abs(mtime_ns - source_mtime) > MOVE_MTIME_TOLERANCE_NS:
+            continue
         
-        for file_name in files:
-            if file_name in EXCLUDE_ITEMS:
+        if MOVE_VERIFY_FINGERPRINT:
+            if source_fingerprint is None:
+                source_fingerprint = get_file_fingerprint(item.source_path, item.size)
+                if source_fingerprint is None:
+                    return None
+            if get_file_fingerprint(os.path.join(item.target_drive, old_path), item.size) != source_fingerprint:
+                continue
+        
+        del entries[index]
+        moves['moved_from'].add((item.target, old_path))
+        return old_path
+    
+    return None
+
+def resolve_moves(moves):
+    unmatched = []
+    
+    for item in moves['missing']:
+        old_path = find_moved_file(moves, item)
+        if old_path is None:
+            unmatched.append(item)
+        else:
+            yield MissingItem(item.path, Reason.MOVED, item.size, old_path, item.target)
+    
+    yield from unmatched
+    
+    for orphan in moves['orphans']:
+        if (orphan.target, orphan.path) not in moves['moved_from']:
+            yield orphan
+
+# ============================== MOVE DETECTION ==============================
+# ============================== SNAPSHOTS ==============================
+
+def list_snapshots(target_drive):
+    snapshot_dir = os.path.join(target_drive, SNAPSHOT_DIR)
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(entry.name for entry in os.scandir(snapshot_dir) if entry.is_dir() and not entry.name.startswith('.'))
+
+def clone_snapshot(previous, current):
+    linked = 0
+    pending = [""]
+    
+    while pending:
+        relative_dir = pending.pop()
+        os.makedirs(os.path.join(current, relative_dir), exist_ok=True)
+        
+        entries = scan_directory(os.path.join(previous, relative_dir), relative_dir)
+        if entries is None:
+            log_message(f"⚠️ Snapshot clone incomplete, {relative_dir or previous} is compared in full")
+            return linked, False
+        
+        for name, entry in entries.items():
+            relative_path = os.path.join(relative_dir, name)
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(relative_path)
                 continue
             
-            source_file = source_path / relative_path / file_name
-            target_file = target_path / relative_path / file_name
-            
-            if not target_file.exists():
-                missing_items.append({
-                    'type': 'file',
-                    'path': str(relative_path / file_name),
-                    'source_path': str(source_file),
-                    'target_path': str(target_file),
-                    'reason': 'File missing',
-                    'size': os.path.getsize(source_file) if source_file.exists() else 0
-                })
-                total_scanned += 1
+            if name.endswith((PARTIAL_SUFFIX, CHECKPOINT_SUFFIX)):
                 continue
             
             try:
-                source_size = os.path.getsize(source_file)
-                target_size = os.path.getsize(target_file)
+                os.link(entry.path, os.path.join(current, relative_path), follow_symlinks=False)
+            except OSError as e:
+                log_message(f"⚠️ Hardlinks not possible, snapshot is copied in full: {str(e)}")
+                return linked, False
+            linked += 1
+    
+    return linked, True
+
+def create_snapshot_folders(target_drives):
+    name = time.strftime(SNAPSHOT_NAME_FORMAT)
+    
+    for attempt in range(1, 100):
+        candidate = name if attempt == 1 else f"{name}-{attempt:02d}"
+        created = []
+        try:
+            for target_drive in target_drives:
+                path = os.path.join(target_drive, SNAPSHOT_DIR, candidate)
+                os.makedirs(path)
+                created.append(path)
+            return candidate
+        except FileExistsError:
+            for path in created:
+                os.rmdir(path)
+    
+    raise FileExistsError(f"No free snapshot name for {name}")
+
+def prepare_snapshots():
+    target_drives = [target_drive for target_drive in get_target_drives() if os.path.isdir(target_drive)]
+    previous = {target_drive: list_snapshots(target_drive) for target_drive in target_drives}
+    name = create_snapshot_folders(target_drives)
+    
+    for target_drive in target_drives:
+        current = os.path.join(target_drive, SNAPSHOT_DIR, name)
+        
+        if previous[target_drive]:
+            latest = previous[target_drive][-1]
+            start = time.time()
+            linked, complete = clone_snapshot(os.path.join(target_drive, SNAPSHOT_DIR, latest), current)
+            if complete:
+                SNAPSHOT_BASES[target_drive] = latest
+            log_message(f"Snapshot {name}: {linked} files linked from {latest} in {time.time() - start:.1f}s")
+        else:
+            log_message(f"Snapshot {name}: first snapshot on {target_drive}, full copy")
+        
+        SNAPSHOT_ROOTS[target_drive] = current
+
+def prune_snapshots():
+    for target_drive in SNAPSHOT_ROOTS:
+        snapshots = list_snapshots(target_drive)
+        for name in snapshots[:-SNAPSHOT_KEEP]:
+            remove_tree(os.path.join(target_drive, SNAPSHOT_DIR, name))
+            log_message(f"Old snapshot deleted: {name}")
+
+# ============================== SNAPSHOTS ==============================
+# ============================== STEP 1: PERFORM COMPLETE COMPARISON ==============================
+
+def compare_directory(relative_dir, target_exists):
+    
+    target_drives = get_target_drives()
+    source_dir = os.path.join(SOURCE_DRIVE, relative_dir)
+    target_dirs = [os.path.join(drive, relative_dir) for drive in target_drives]
+    
+    if SCAN_INDEX is not None:
+        source_mtime = get_mtime_ns(source_dir)
+        target_mtimes = [get_mtime_ns(target_dir) if exists else None
+                         for target_dir, exists in zip(target_dirs, target_exists)]
+        target_mtime = None if None in target_mtimes else max(target_mtimes)
+        
+        unchanged = reuse_indexed_directory(relative_dir, source_mtime, target_mtime)
+        if unchanged is not None:
+            add_metric('directories_reused')
+            subdirectories, scanned = unchanged
+            return [], [(path, (True,) * len(target_drives)) for path in subdirectories], scanned, []
+    
+    source_entries = scan_directory(source_dir, relative_dir)
+    
+    if source_entries is None:
+        return [MissingItem(relative_dir, Reason.UNREADABLE_SOURCE)], [], 0, []
+    
+    source_dirs = {name for name, entry in source_entries.items() if entry.is_dir()}
+    source_files = source_entries.keys() - source_dirs
+    
+    targets = []
+    for index, (target_dir, exists) in enumerate(zip(target_dirs, target_exists)):
+        target_entries = (scan_directory(target_dir, relative_dir) or {}) if exists else {}
+        target_subdirs = {name for name, entry in target_entries.items() if entry.is_dir()}
+        targets.append((index, target_entries, source_dirs - target_subdirs,
+                        source_files - (target_entries.keys() - target_subdirs)))
+    
+    problems = []
+    if is_mirroring() or DETECT_MOVES:
+        for index, target_entries, _, _ in targets:
+            problems.extend(find_orphans(relative_dir, source_entries, target_entries, index))
+    
+    subdirectories = []
+    hash_checks = []
+    indexed_files = []
+    stat_calls = 0
+    
+    for name, entry in source_entries.items():
+        relative_path = os.path.join(relative_dir, name)
+        
+        if name in source_dirs:
+            for index, _, missing_dirs, _ in targets:
+                if name in missing_dirs:
+                    problems.append(MissingItem(relative_path, Reason.DIRECTORY_MISSING, target=index))
+            
+            if not entry.is_symlink():
+                subdirectories.append((relative_path, tuple(name not in missing_dirs
+                                                            for _, _, missing_dirs, _ in targets)))
+            continue
+        
+        file_problems = []
+        target_hashes = []
+        index = None
+        failed = False
+        try:
+            source_stat = entry.stat()
+            stat_calls += 1
+            source_size = source_stat.st_size
+            source_hash = None
+            
+            for index, target_entries, _, missing_files in targets:
+                if name in missing_files:
+                    file_problems.append(MissingItem(relative_path, Reason.FILE_MISSING, source_size, target=index))
+                    continue
+                
+                target_stat = target_entries[name].stat()
+                stat_calls += 1
+                target_size = target_stat.st_size
                 
                 if source_size != target_size:
-                    missing_items.append({
-                        'type': 'file',
-                        'path': str(relative_path / file_name),
-                        'source_path': str(source_file),
-                        'target_path': str(target_file),
-                        'reason': f'Size mismatch ({source_size} vs {target_size} bytes)',
-                        'size': source_size
-                    })
+                    file_problems.append(MissingItem(relative_path, Reason.SIZE_MISMATCH, source_size, target_size, index))
                 
-                elif USE_HASH_COMPARISON:
-                    source_hash = get_file_hash(source_file)
-                    target_hash = get_file_hash(target_file)
-                    
-                    if source_hash and target_hash and source_hash != target_hash:
-                        missing_items.append({
-                            'type': 'file',
-                            'path': str(relative_path / file_name),
-                            'source_path': str(source_file),
-                            'target_path': str(target_file),
-                            'reason': 'Content mismatch (hash)',
-                            'size': source_size
-                        })
-            
-            except Exception as e:
-                missing_items.append({
-                    'type': 'file',
-                    'path': str(relative_path / file_name),
-                    'source_path': str(source_file),
-                    'target_path': str(target_file),
-                    'reason': f'Error during comparison: {str(e)}',
-                    'size': 0
-                })
-            
-            total_scanned += 1
-            
-            if total_scanned % PROGRESS_INTERVAL_SCAN == 0:
-                elapsed = time.time() - start_time
+                elif HASH_POOL is not None:
+                    fingerprint = not USE_HASH_COMPARISON
+                    if source_hash is None:
+                        source_hash = HASH_POOL.submit(get_cached_hash, entry.path, source_stat, None, fingerprint)
+                    target_file = target_entries[name].path
+                    target_hashes.append((index, HASH_POOL.submit(get_cached_hash, target_file, target_stat, None, fingerprint)))
+        
+        except Exception as e:
+            record_error(e)
+            failed = True
+            for failed_target in ([index] if index is not None else [target[0] for target in targets]):
+                file_problems.append(MissingItem(relative_path, Reason.COMPARISON_ERROR, 0, str(e), failed_target))
+        
+        if target_hashes:
+            hash_checks.append({
+                'path': relative_path,
+                'directory': relative_dir,
+                'size': source_size,
+                'fingerprint': fingerprint,
+                'source_hash': source_hash,
+                'target_hashes': target_hashes,
+                'problems': file_problems
+            })
+        else:
+            problems.extend(file_problems)
+        
+        if not failed:
+            indexed_files.append((relative_path, source_size, source_stat.st_mtime_ns, None))
+    
+    if SCAN_INDEX is not None:
+        if problems or any(check['problems'] for check in hash_checks):
+            source_mtime = target_mtime = None
+        record_directory(relative_dir, source_mtime, target_mtime, len(source_entries), indexed_files)
+    
+    add_metric('stat_calls', stat_calls)
+    return problems, subdirectories, len(source_entries), hash_checks
+
+def find_orphans(relative_dir, source_entries, target_entries, target=0):
+    orphans = []
+    
+    for name, entry in target_entries.items():
+        if not relative_dir and name == DEDUP_STORE_DIR:
+            continue
+        
+        source_entry = source_entries.get(name)
+        
+        if source_entry is None:
+            base_name = name.removesuffix(CHECKPOINT_SUFFIX).removesuffix(PARTIAL_SUFFIX)
+            if base_name != name and base_name in source_entries:
+                continue
+        elif source_entry.is_dir() == entry.is_dir():
+            continue
+        
+        relative_path = os.path.join(relative_dir, name)
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                orphans.append(MissingItem(relative_path, Reason.ORPHANED_DIRECTORY, target=target))
+            else:
+                orphans.append(MissingItem(relative_path, Reason.ORPHANED_FILE, entry.stat(follow_symlinks=False).st_size,
+                                           target=target))
+        except OSError as e:
+            orphans.append(MissingItem(relative_path, Reason.COMPARISON_ERROR, 0, str(e), target))
+    
+    return orphans
+
+def new_directory_walker():
+    return {
+        'pool': ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan"),
+        'lock': threading.Lock(),
+        'queued': 0
+    }
+
+def submit_directory(walker, relative_dir, target_exists, force=False, recursive=True):
+    with walker['lock']:
+        if not force and walker['queued'] >= SCAN_QUEUE_SIZE:
+            return None
+        walker['queued'] += 1
+    return walker['pool'].submit(walk_directory, walker, relative_dir, target_exists, recursive)
+
+def walk_directory(walker, relative_dir, target_exists, recursive=True):
+    problems, subdirectories, scanned, hash_checks = compare_directory(relative_dir, target_exists)
+    if not recursive:
+        subdirectories = [(path, exists) for path, exists in subdirectories if not all(exists)]
+    children = [(path, exists, submit_directory(walker, path, exists)) for path, exists in subdirectories]
+    return problems, children, scanned, hash_checks
+
+def resolve_hash_check(check):
+    source_hash = check['source_hash'].result()
+    problems = list(check['problems'])
+    
+    if SCAN_INDEX is not None and source_hash and not check['fingerprint']:
+        update_indexed_hash(check['path'], source_hash)
+    
+    for target, target_hash in check['target_hashes']:
+        target_hash = target_hash.result()
+        
+        if source_hash and target_hash and source_hash != target_hash:
+            reason = Reason.FINGERPRINT_MISMATCH if check['fingerprint'] else Reason.HASH_MISMATCH
+            problems.append(MissingItem(check['path'], reason, check['size'], target=target))
+    
+    if problems and SCAN_INDEX is not None:
+        invalidate_indexed_directory(check['directory'])
+    
+    return sorted(problems, key=lambda problem: problem.target)
+
+def new_scan_stats():
+    return {
+        'scanned': 0,
+        'directories': 0,
+        'files': 0,
+        'orphans': 0,
+        'moves': 0,
+        'drives_ok': False,
+        'start_time': time.time()
+    }
+
+def check_drives():
+    
+    if not os.path.isdir(SOURCE_DRIVE):
+        log_message(f"❌ ERROR: Source path does not exist: {SOURCE_DRIVE}")
+        return False
+    
+    for target_drive in get_target_drives():
+        if not os.path.isdir(target_drive):
+            log_message(f"❌ ERROR: Target path does not exist: {target_drive}")
+            return False
+    
+    log_message(f"Source: {SOURCE_DRIVE}")
+    log_message(f"Target: {', '.join(get_target_drives())}")
+    log_message(f"Hash comparison: {f'YES - {get_content_check_label()}' if get_content_check_label() else 'NO'}")
+    log_message(f"Incremental scan: {'YES' if USE_INCREMENTAL_SCAN else 'NO'}")
+    return True
+
+def iter_discrepancies(scan_stats, changes=None):
+    global HASH_POOL
+    
+    if USE_INCREMENTAL_SCAN and changes is None:
+        open_scan_index()
+    
+    if USE_HASH_COMPARISON or USE_QUICK_FINGERPRINT:
+        check_hash_algorithm()
+        HASH_POOL = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+        if USE_HASH_CACHE:
+            open_hash_cache()
+    
+    if USE_DEDUP_STORE:
+        check_hash_algorithm()
+        if USE_HASH_CACHE and HASH_CACHE is None:
+            open_hash_cache()
+    
+    last_progress = 0
+    scan_start = time.time()
+    moves = new_move_index() if DETECT_MOVES else None
+    
+    walker = new_directory_walker()
+    pending = [("", (True,) * len(get_target_drives()), None)]
+    visited = None
+    
+    if changes is not None:
+        pending = []
+        visited = set()
+        for relative_dir, recursive in sorted(changes.items(), reverse=True):
+            target_exists = tuple(os.path.isdir(os.path.join(target_drive, relative_dir)) for target_drive in get_target_drives())
+            pending.append((relative_dir, target_exists,
+                            submit_directory(walker, relative_dir, target_exists, force=True, recursive=recursive)))
+    
+    hash_checks = deque()
+    
+    try:
+        while pending:
+            relative_dir, target_exists, future = pending.pop()
+            if future is None:
+                future = submit_directory(walker, relative_dir, target_exists, force=True)
+            problems, children, scanned, new_checks = future.result()
+            with walker['lock']:
+                walker['queued'] -= 1
+            
+            if visited is not None:
+                if relative_dir in visited:
+                    continue
+                visited.add(relative_dir)
+            
+            scan_stats['scanned'] += scanned
+            pending.extend(reversed(children))
+            
+            for problem in problems:
+                if moves is not None and defer_for_move(moves, problem):
+                    continue
+                count_problem(scan_stats, problem)
+                yield problem
+            
+            hash_checks.extend(new_checks)
+            while len(hash_checks) > HASH_WORKERS * 4:
+                for problem in resolve_hash_check(hash_checks.popleft()):
+                    if moves is not None and defer_for_move(moves, problem):
+                        continue
+                    count_problem(scan_stats, problem)
+                    yield problem
+            
+            if scan_stats['scanned'] - last_progress >= PROGRESS_INTERVAL_SCAN:
+                last_progress = scan_stats['scanned']
+                elapsed = time.time() - scan_stats['start_time']
                 elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
-                print(f"\rScanned: {total_scanned} | Missing: {len(missing_items)} | Time: {elapsed_str}", end="")
+                problems_found = scan_stats['directories'] + scan_stats['files']
+                print(f"\rScanned: {scan_stats['scanned']} | Missing: {problems_found} | Time: {elapsed_str}", end="")
+        
+        while hash_checks:
+            for problem in resolve_hash_check(hash_checks.popleft()):
+                if moves is not None and defer_for_move(moves, problem):
+                    continue
+                count_problem(scan_stats, problem)
+                yield problem
+        
+        if moves is not None:
+            for problem in resolve_moves(moves):
+                count_problem(scan_stats, problem)
+                yield problem
+        
+        if not SCAN_INDEX_PREVIOUS and HASH_POOL is not None and changes is None:
+            evict_hash_cache()
     
-    elapsed = time.time() - start_time
+    finally:
+        walker['pool'].shutdown(cancel_futures=True)
+        if HASH_POOL is not None:
+            HASH_POOL.shutdown(cancel_futures=True)
+            HASH_POOL = None
+        add_metric('scan_seconds', time.time() - scan_start)
+
+def count_problem(scan_stats, problem):
+    if problem.orphaned:
+        scan_stats['orphans'] += 1
+        return
+    
+    scan_stats['directories' if problem.type == 'directory' else 'files'] += 1
+    if problem.reason == Reason.MOVED:
+        scan_stats['moves'] += 1
+
+def print_comparison_result(scan_stats):
+    elapsed = time.time() - scan_stats['start_time']
     elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
+    problems_found = scan_stats['directories'] + scan_stats['files']
     
     print(f"\r{' '*80}")
     print(f"\nComparison complete!")
-    print(f"Elements scanned: {total_scanned}")
-    print(f"Missing/faulty elements: {len(missing_items)}")
+    print(f"Elements scanned: {scan_stats['scanned']}")
+    print(f"Missing/faulty elements: {problems_found}")
+    if is_mirroring():
+        print(f"Only on target: {scan_stats['orphans']}")
+    if DETECT_MOVES:
+        print(f"Moved on source: {scan_stats['moves']}")
     print(f"Time elapsed: {elapsed_str}")
     
-    log_message(f"Comparison complete: {total_scanned} elements scanned, {len(missing_items)} problems found")
+    log_message(f"Comparison complete: {scan_stats['scanned']} elements scanned, {problems_found} problems found")
+
+def perform_complete_comparison(scan_stats):
+    
+    print_header("STEP 1: COMPARE ALL FILES AND FOLDERS")
+    log_message("START: Complete comparison")
+    
+    scan_stats['drives_ok'] = check_drives()
+    if not scan_stats['drives_ok']:
+        return []
+    
+    print(f"Scanning source directory...")
+    
+    missing_items = list(write_check_csv(iter_discrepancies(scan_stats)))
+    
+    print_comparison_result(scan_stats)
     
     return missing_items
 
 # ============================== STEP 1: PERFORM COMPLETE COMPARISON ==============================
 # ============================== STEP 2: COPY MISSING ITEMS ==============================
 
-def copy_missing_items(missing_items):
+KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+                           errno.EOPNOTSUPP, errno.ENOTSUP, errno.EPERM}
+
+def copy_chunks_kernel(copy_call, source_fd, target_fd, progress, chunk_size):
+    while True:
+        try:
+            copied = copy_call(source_fd, target_fd, chunk_size)
+        except OSError as e:
+            if e.errno in KERNEL_COPY_UNSUPPORTED:
+                return False
+            raise
+        
+        if not copied:
+            return True
+        if progress:
+            progress(copied)
+
+def copy_chunks_userspace(source, targets, progress, buffer_size=None):
+    buffer = bytearray(buffer_size or get_throttled_chunk_size(COPY_BUFFER_SIZE))
+    view = memoryview(buffer)
+    while True:
+        size = source.readinto(buffer)
+        if not size:
+            return
+        for target in targets:
+            target.write(view[:size])
+            if progress:
+                progress(size)
+
+def copy_file_data(source_file, target_file, progress=None, method=None, chunk_size=None):
+    method = method or COPY_METHOD
+    chunk_size = get_throttled_chunk_size(chunk_size or COPY_CHUNK_SIZE)
+    target_files = target_file if isinstance(target_file, list) else [target_file]
     
-    if not missing_items:
-        print("\n✓ No missing elements found - nothing to copy.")
-        log_message("No missing elements - copy step skipped")
-        return True
+    if method == "copy2":
+        for target in target_files:
+            shutil.copy2(source_file, target)
+            if progress:
+                progress(os.path.getsize(target))
+        return "copy2"
     
-    print_header("STEP 2: COPY MISSING ELEMENTS")
-    log_message(f"START: Copy {len(missing_items)} missing elements")
+    with ExitStack() as stack:
+        source = stack.enter_context(open(source_file, 'rb', buffering=0))
+        targets = [stack.enter_context(open(target, 'wb')) for target in target_files]
+        used = "readwrite"
+        
+        kernel_calls = []
+        if len(targets) == 1 and method == "auto" and hasattr(os, "copy_file_range"):
+            kernel_calls.append(("copy_file_range", os.copy_file_range))
+        if len(targets) == 1 and method in ("auto", "sendfile") and hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+            kernel_calls.append(("sendfile", lambda src, dst, count: os.sendfile(dst, src, None, count)))
+        
+        for name, copy_call in kernel_calls:
+            if copy_chunks_kernel(copy_call, source.fileno(), targets[0].fileno(), progress, chunk_size):
+                used = name
+                break
+        else:
+            copy_chunks_userspace(source, targets, progress)
+    
+    for target in target_files:
+        shutil.copystat(source_file, target)
+    return used
+
+def read_checkpoints(part_file, checkpoint_file, header, chunk_size, algorithm):
+    try:
+        with open(checkpoint_file, encoding=FILE_ENCODING) as f:
+            lines = f.read().splitlines()
+        part_size = os.path.getsize(part_file)
+    except OSError:
+        return []
+    
+    if not lines or lines[0] != header:
+        return []
+    
+    digest_length = len(new_hasher(algorithm).hexdigest())
+    digests = []
+    for line in lines[1:]:
+        if len(line) != digest_length:
+            break
+        digests.append(line)
+    digests = digests[:part_size // chunk_size]
+    if not digests:
+        return []
+    
+    count = len(digests)
+    samples = sorted({count - 1} | {i * count // (FINGERPRINT_CHUNKS + 1) for i in range(FINGERPRINT_CHUNKS + 1)})
+    with open(part_file, 'rb') as f:
+        for index in samples:
+            f.seek(index * chunk_size)
+            hasher = new_hasher(algorithm)
+            hasher.update(f.read(chunk_size))
+            if hasher.hexdigest() != digests[index]:
+                return digests[:index]
+    
+    return digests
+
+def copy_file_resumable(source_file, target_file, progress=None, chunk_size=None):
+    chunk_size = chunk_size or COPY_CHUNK_SIZE
+    target_files = target_file if isinstance(target_file, list) else [target_file]
+    part_files = [f"{target}{PARTIAL_SUFFIX}" for target in target_files]
+    checkpoint_files = [f"{part}{CHECKPOINT_SUFFIX}" for part in part_files]
+    algorithm = HASH_ALGORITHM
+    source_stat = os.stat(source_file)
+    header = f"{source_stat.st_size} {source_stat.st_mtime_ns} {chunk_size} {algorithm}"
+    
+    digests = min((read_checkpoints(part, checkpoint, header, chunk_size, algorithm)
+                   for part, checkpoint in zip(part_files, checkpoint_files)), key=len)
+    offset = len(digests) * chunk_size
+    
+    with ExitStack() as stack:
+        source = stack.enter_context(open(source_file, 'rb', buffering=0))
+        targets = []
+        checkpoint_logs = []
+        for part, checkpoint in zip(part_files, checkpoint_files):
+            target = stack.enter_context(open(part, 'r+b' if offset else 'wb'))
+            checkpoints = stack.enter_context(open(checkpoint, 'w', encoding=FILE_ENCODING))
+            checkpoints.write("\n".join([header] + digests) + "\n")
+            checkpoints.flush()
+            target.seek(offset)
+            target.truncate()
+            targets.append(target)
+            checkpoint_logs.append(checkpoints)
+        source.seek(offset)
+        
+        buffer = bytearray(get_throttled_chunk_size(COPY_BUFFER_SIZE))
+        view = memoryview(buffer)
+        while True:
+            hasher = new_hasher(algorithm)
+            chunk_bytes = 0
+            while chunk_bytes < chunk_size:
+                size = source.readinto(view[:min(len(buffer), chunk_size - chunk_bytes)])
+                if not size:
+                    break
+                hasher.update(view[:size])
+                for target in targets:
+                    target.write(view[:size])
+                    if progress:
+                        progress(size)
+                chunk_bytes += size
+            
+            if chunk_bytes < chunk_size:
+                break
+            
+            digest = hasher.hexdigest()
+            for target, checkpoints in zip(targets, checkpoint_logs):
+                target.flush()
+                os.fsync(target.fileno())
+                checkpoints.write(digest + "\n")
+                checkpoints.flush()
+    
+    for target, part, checkpoint in zip(target_files, part_files, checkpoint_files):
+        shutil.copystat(source_file, part)
+        os.replace(part, target)
+        os.remove(checkpoint)
+    return offset
+
+def get_store_dir(target_drive):
+    return os.path.join(os.path.dirname(target_drive) if SNAPSHOT_MODE else target_drive, DEDUP_STORE_DIR)
+
+def get_object_path(digest, target_drive):
+    return os.path.join(get_store_dir(target_drive), digest[:2], digest[2:4], digest)
+
+def copy_file_deduplicated(source_file, target_file, target_drive, progress=None):
+    source_stat = os.stat(source_file)
+    digest = get_cached_hash(str(source_file), source_stat)
+    if digest is None:
+        raise OSError(f"Cannot hash {source_file}")
+    
+    object_path = get_object_path(digest, target_drive)
+    
+    with DEDUP_LOCKS[int(digest[:8], 16) % len(DEDUP_LOCKS)]:
+        stored = os.path.isfile(object_path)
+        
+        if not stored:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_object = f"{object_path}.{threading.get_ident()}.tmp"
+            try:
+                copy_file_data(source_file, temp_object, progress)
+                current_stat = os.stat(source_file)
+                if (current_stat.st_size, current_stat.st_mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+                    raise OSError(f"Source changed while copying: {source_file}")
+                os.replace(temp_object, object_path)
+            finally:
+                if os.path.exists(temp_object):
+                    os.remove(temp_object)
+        
+        if os.path.lexists(target_file):
+            os.remove(target_file)
+        try:
+            os.link(object_path, target_file)
+        except OSError:
+            copy_file_data(object_path, target_file)
+    
+    return stored
+
+def prune_dedup_store(target_drive):
+    removed = freed = 0
+    
+    for directory, _, files in os.walk(get_store_dir(target_drive)):
+        for name in files:
+            object_path = os.path.join(directory, name)
+            try:
+                object_stat = os.stat(object_path)
+                if object_stat.st_nlink == 1:
+                    os.remove(object_path)
+                    removed += 1
+                    freed += object_stat.st_size
+            except OSError as e:
+                log_message(f"⚠️ Cannot prune object {object_path}: {str(e)}", print_also=False)
+    
+    return removed, freed
+
+def copy_file_delta(source_file, target_file, progress=None, block_size=None):
+    block_size = block_size or DELTA_BLOCK_SIZE
+    source_size = os.path.getsize(source_file)
+    target_size = os.path.getsize(target_file)
+    common_size = min(source_size, target_size)
+    written = 0
+    
+    source_buffer = bytearray(block_size)
+    target_buffer = bytearray(block_size)
+    source_view = memoryview(source_buffer)
+    target_view = memoryview(target_buffer)
     
-    stats = {
+    with open(source_file, 'rb', buffering=0) as source, open(target_file, 'r+b') as target:
+        offset = 0
+        while offset < common_size:
+            length = min(block_size, common_size - offset)
+            size = source.readinto(source_view[:length])
+            if not size:
+                break
+            target.seek(offset)
+            target.readinto(target_view[:size])
+            
+            if (source_buffer != target_buffer) if size == block_size else (source_buffer[:size] != target_buffer[:size]):
+                target.seek(offset)
+                target.write(source_view[:size])
+                written += size
+            
+            offset += size
+            if progress:
+                progress(size)
+        
+        if source_size > target_size:
+            target.seek(target_size)
+            copy_chunks_userspace(source, [target], progress)
+            written += source_size - target_size
+        elif source_size < target_size:
+            target.truncate(source_size)
+    
+    shutil.copystat(source_file, target_file)
+    return written
+
+FS_IOC_FIEMAP = 0xC020660B
+
+def get_physical_offset(path):
+    if fcntl is None:
+        return None
+    
+    buffer = bytearray(struct.pack("=QQLLLL", 0, 2**64 - 1, 0, 0, 1, 0) + bytes(56))
+    try:
+        with open(path, 'rb') as f:
+            fcntl.ioctl(f.fileno(), FS_IOC_FIEMAP, buffer)
+    except OSError:
+        return None
+    
+    if not struct.unpack_from("=L", buffer, 20)[0]:
+        return None
+    return struct.unpack_from("=Q", buffer, 40)[0]
+
+def get_copy_order():
+    if COPY_ORDER == "auto":
+        return "discovery" if STREAMING_PIPELINE else "inode"
+    return COPY_ORDER
+
+def get_copy_position(source_path):
+    try:
+        source_stat = os.stat(source_path)
+    except OSError:
+        return (0, 0, 0)
+    
+    offset = get_physical_offset(source_path) if get_copy_order() == "extent" else None
+    return (source_stat.st_dev, offset or 0, source_stat.st_ino)
+
+def schedule_copies(items):
+    window = []
+    
+    def sorted_window():
+        positions = {item.path: get_copy_position(item.source_path) for item in window}
+        return sorted(window, key=lambda item: (positions[item.path], item.path))
+    
+    window_start = 0
+    
+    for item in items:
+        if window and item.path != window[-1].path and (len(window) >= COPY_SCHEDULE_WINDOW
+                                                        or time.monotonic() - window_start >= COPY_SCHEDULE_MAX_DELAY):
+            yield from sorted_window()
+            window = []
+        
+        if item.type != 'file' or item.orphaned or item.reason == Reason.MOVED:
+            yield item
+            continue
+        
+        if not window:
+            window_start = time.monotonic()
+        window.append(item)
+    
+    yield from sorted_window()
+
+def print_copy_progress(stats, total_files=None):
+    done = stats['files_processed']
+    total = total_files or stats['files_queued']
+    elapsed = time.time() - stats['start_time']
+    percent = (done / total) * 100 if total else 0
+    speed = stats['total_bytes'] / elapsed / 1024 / 1024 if elapsed > 0 else 0
+    
+    print(f"\rFiles: {done}/{total} ({percent:.1f}%) | "
+          f"{stats['total_bytes']/1024**3:.2f} GB | "
+          f"{speed:.1f} MB/s", end="")
+
+def copy_file_item(items, stats, stats_lock, device_slots, total_files=None):
+    
+    copied_bytes = 0
+    start = time.perf_counter()
+    item = items[0]
+    try:
+        source_file = Path(item.source_path)
+        
+        if not source_file.exists():
+            log_message(f"⚠️ Source does not exist: {item.path}")
+            with stats_lock:
+                stats['files_skipped'] += len(items)
+            return
+        
+        read_share = 1
+        
+        def progress(size):
+            nonlocal copied_bytes
+            if COPY_ABORT.is_set():
+                raise InterruptedError("Copy aborted")
+            limit_bandwidth(size * read_share, size)
+            copied_bytes += size
+            with stats_lock:
+                stats['total_bytes'] += size
+                now = time.time()
+                if now - stats['progress_time'] >= PROGRESS_REFRESH_SECONDS:
+                    stats['progress_time'] = now
+                    print_copy_progress(stats, total_files)
+        
+        tee_items = []
+        for item in items:
+            target_file = Path(item.target_path)
+            
+            target_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            shared = item.reason != Reason.FILE_MISSING and target_file.is_file() and target_file.stat().st_nlink > 1
+            if shared:
+                target_file.unlink()
+            
+            dedup = USE_DEDUP_STORE and item.size >= DEDUP_MIN_SIZE
+            delta = (USE_DELTA_COPY and not dedup and not shared and item.size >= DELTA_COPY_THRESHOLD
+                     and item.reason != Reason.FILE_MISSING and target_file.is_file())
+            
+            if not (dedup or delta):
+                tee_items.append(item)
+                continue
+            
+            with device_slots[item.target_drive]:
+                if dedup:
+                    if copy_file_deduplicated(source_file, target_file, item.target_drive, progress):
+                        with stats_lock:
+                            stats['dedup_linked'] += 1
+                            stats['dedup_bytes_saved'] += item.size
+                else:
+                    written = copy_file_delta(source_file, target_file, progress)
+                    with stats_lock:
+                        stats['delta_files'] += 1
+                        stats['delta_bytes_unchanged'] += max(item.size - written, 0)
+            
+            with stats_lock:
+                stats['files_copied'] += 1
+            forget_cached_hash(item.target_path)
+        
+        if tee_items:
+            target_files = [Path(item.target_path) for item in tee_items]
+            read_share = 1 / len(target_files)
+            resumable = RESUMABLE_COPY and item.size >= RESUMABLE_COPY_THRESHOLD
+            chunked = resumable or item.size >= get_throttled_chunk_size(COPY_CHUNK_SIZE)
+            
+            with ExitStack() as stack:
+                for slot in dict.fromkeys(device_slots[item.target_drive] for item in tee_items):
+                    stack.enter_context(slot)
+                
+                if resumable:
+                    resumed = copy_file_resumable(source_file, target_files, progress)
+                    if resumed:
+                        log_message(f"Copy resumed: {item.path} at {resumed/1024**2:.0f} MB", print_also=False)
+                else:
+                    copy_file_data(source_file, target_files, progress if chunked else None)
+            
+            file_size = os.path.getsize(target_files[0])
+            with stats_lock:
+                stats['files_copied'] += len(target_files)
+                if not chunked:
+                    stats['total_bytes'] += file_size * len(target_files)
+            if not chunked:
+                limit_bandwidth(file_size, file_size * len(target_files))
+            
+            for target_file in target_files:
+                forget_cached_hash(str(target_file))
+        
+        file_size = os.path.getsize(item.target_path)
+        targets_note = f" to {len(items)} targets" if len(items) > 1 else ""
+        log_message(f"File copied: {item.path} ({file_size} bytes){targets_note}")
+        observe_copy_speed(file_size, time.perf_counter() - start)
+    
+    except Exception as e:
+        with stats_lock:
+            stats['errors'] += 1
+            stats['total_bytes'] -= copied_bytes
+        record_error(e)
+        log_message(f"❌ Error copying {item.path}: {str(e)}")
+    
+    finally:
+        add_metric('copy_seconds', time.perf_counter() - start)
+        with stats_lock:
+            stats['files_processed'] += len(items)
+            done = stats['files_processed']
+            
+            if done % PROGRESS_INTERVAL_COPY < len(items) or done == (total_files or stats['files_queued']):
+                print_copy_progress(stats, total_files)
+
+def copy_file_batch(groups, stats, stats_lock, device_slots, total_files=None):
+    for group in groups:
+        if COPY_ABORT.is_set():
+            return
+        copy_file_item(group, stats, stats_lock, device_slots, total_files)
+
+def remove_tree(path):
+    def clear_readonly(function, failed_path, _):
+        os.chmod(failed_path, stat.S_IWRITE)
+        function(failed_path)
+    
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=clear_readonly)
+    else:
+        shutil.rmtree(path, onerror=clear_readonly)
+
+def prune_orphan(item, stats, stats_lock):
+    if is_mirror_dry_run():
+        with stats_lock:
+            stats['orphans_found'] += 1
+            stats['orphan_bytes'] += item.size
+        log_message(f"Only on target (dry run): {item.path}", print_also=False)
+        return
+    
+    if not stats['deletions_blocked'] and not os.path.isdir(SOURCE_DRIVE):
+        with stats_lock:
+            stats['deletions_blocked'] = True
+            stats['errors'] += 1
+        log_message(f"❌ Source {SOURCE_DRIVE} is not reachable anymore - nothing is deleted from the target")
+    
+    if stats['deletions_blocked']:
+        with stats_lock:
+            stats['orphans_found'] += 1
+            stats['orphans_kept'] += 1
+        log_message(f"Not deleted (source incomplete): {item.path}", print_also=False)
+        return
+    
+    try:
+        if item.type == 'directory':
+            remove_tree(item.target_path)
+        else:
+            try:
+                os.remove(item.target_path)
+            except PermissionError:
+                os.chmod(item.target_path, stat.S_IWRITE)
+                os.remove(item.target_path)
+            forget_cached_hash(item.target_path)
+        
+        with stats_lock:
+            stats['orphans_found'] += 1
+            stats['orphans_deleted'] += 1
+            stats['orphan_bytes'] += item.size
+        log_message(f"Deleted from target: {item.path}", print_also=False)
+    
+    except Exception as e:
+        with stats_lock:
+            stats['errors'] += 1
+        record_error(e)
+        log_message(f"❌ Error deleting {item.path}: {str(e)}")
+
+def move_target_file(item, stats, stats_lock):
+    old_target = os.path.join(item.target_drive, item.detail)
+    
+    try:
+        Path(item.target_path).parent.mkdir(parents=True, exist_ok=True)
+        os.rename(old_target, item.target_path)
+        forget_cached_hash(old_target)
+    
+    except Exception as e:
+        log_message(f"⚠️ Rename failed, copying instead: {item.detail} -> {item.path} ({str(e)})", print_also=False)
+        return False
+    
+    with stats_lock:
+        stats['files_moved'] += 1
+        stats['moved_bytes'] += item.size
+    log_message(f"File moved on target: {item.detail} -> {item.path}", print_also=False)
+    return True
+
+def new_copy_stats():
+    return {
         'directories_created': 0,
         'files_copied': 0,
         'files_skipped': 0,
+        'files_queued': 0,
+        'files_processed': 0,
         'total_bytes': 0,
+        'delta_files': 0,
+        'delta_bytes_unchanged': 0,
+        'orphans_found': 0,
+        'orphans_deleted': 0,
+        'orphans_kept': 0,
+        'deletions_blocked': False,
+        'orphan_bytes': 0,
+        'files_moved': 0,
+        'moved_bytes': 0,
+        'dedup_linked': 0,
+        'dedup_bytes_saved': 0,
+        'objects_pruned': 0,
+        'object_bytes_pruned': 0,
         'errors': 0,
-        'start_time': time.time()
+        'start_time': time.time(),
+        'progress_time': 0
     }
+
+def copy_items(items, stats, total_files=None):
+    
+    stats_lock = threading.Lock()
+    device_slots = {target_drive: get_device_slot(target_drive) for target_drive in get_target_drives()}
+    
+    small_pool = ThreadPoolExecutor(max_workers=COPY_WORKERS)
+    large_pool = ThreadPoolExecutor(max_workers=LARGE_FILE_WORKERS)
+    small_queue = threading.BoundedSemaphore(COPY_QUEUE_SIZE)
+    large_queue = threading.BoundedSemaphore(COPY_QUEUE_SIZE)
+    COPY_ABORT.clear()
+    interrupted = True
     
-    print("Creating missing directories...")
-    directories = [item for item in missing_items if item['type'] == 'directory']
+    def submit_copy(groups):
+        if groups[0][0].size >= LARGE_FILE_THRESHOLD:
+            pool, queue_slot = large_pool, large_queue
+        else:
+            pool, queue_slot = small_pool, small_queue
+        
+        queue_slot.acquire()
+        with stats_lock:
+            stats['files_queued'] += sum(len(group) for group in groups)
+        future = pool.submit(copy_file_batch, groups, stats, stats_lock, device_slots, total_files)
+        future.add_done_callback(lambda _, slot=queue_slot: slot.release())
     
-    for i, item in enumerate(directories, 1):
-        try:
-            target_dir = Path(item['target_path'])
-            target_dir.mkdir(parents=True, exist_ok=True)
-            stats['directories_created'] += 1
-            
-            print(f"\rDirectories: {i}/{len(directories)}", end="")
-            log_message(f"Directory created: {item['path']}")
+    batch = []
+    batch_bytes = 0
+    
+    def add_copy(group):
+        nonlocal batch, batch_bytes
+        if group[0].size >= LARGE_FILE_THRESHOLD:
+            submit_copy([group])
+            return
         
-        except Exception as e:
-            stats['errors'] += 1
-            log_message(f"❌ Error creating {item['path']}: {str(e)}")
+        if batch and (os.path.dirname(group[0].path) != os.path.dirname(batch[0][0].path)
+                      or len(batch) >= SMALL_FILE_BATCH_SIZE or batch_bytes >= SMALL_FILE_BATCH_BYTES):
+            submit_copy(batch)
+            batch, batch_bytes = [], 0
+        batch.append(group)
+        batch_bytes += group[0].size
     
-    if directories:
-        print()
+    if get_copy_order() != "discovery":
+        items = schedule_copies(items)
     
-    files = [item for item in missing_items if item['type'] == 'file']
+    group = []
     
-    if files:
-        print(f"Copying {len(files)} missing files...")
-        
-        for i, item in enumerate(files, 1):
-            try:
-                source_file = Path(item['source_path'])
-                target_file = Path(item['target_path'])
-                
-                if not source_file.exists():
-                    log_message(f"⚠️ Source does not exist: {item['path']}")
-                    stats['files_skipped'] += 1
-                    continue
-                
-                target_file.parent.mkdir(parents=True, exist_ok=True)
-                
-                file_size = os.path.getsize(source_file)
-                shutil.copy2(source_file, target_file)
-                
-                stats['files_copied'] += 1
-                stats['total_bytes'] += file_size
-                
-                if i % PROGRESS_INTERVAL_COPY == 0 or i == len(files):
-                    elapsed = time.time() - stats['start_time']
-                    percent = (i / len(files)) * 100
-                    speed = stats['total_bytes'] / elapsed / 1024 / 1024 if elapsed > 0 else 0
-                    
-                    print(f"\rFiles: {i}/{len(files)} ({percent:.1f}%) | "
-                          f"{stats['total_bytes']/1024**3:.2f} GB | "
-                          f"{speed:.1f} MB/s", end="")
+    try:
+        for item in items:
+            if group and item.path != group[0].path:
+                add_copy(group)
+                group = []
+            
+            if item.reason == Reason.UNREADABLE_SOURCE:
+                with stats_lock:
+                    stats['errors'] += 1
+                    stats['deletions_blocked'] = True
+                log_message(f"❌ Source folder cannot be read, skipped: {item.path or SOURCE_DRIVE}")
+                continue
+            
+            if item.orphaned:
+                prune_orphan(item, stats, stats_lock)
+                continue
+            
+            if item.reason == Reason.MOVED and move_target_file(item, stats, stats_lock):
+                continue
+            
+            if item.type == 'directory':
+                try:
+                    Path(item.target_path).mkdir(parents=True, exist_ok=True)
+                    with stats_lock:
+                        stats['directories_created'] += 1
+                    log_message(f"Directory created: {item.path}")
                 
-                log_message(f"File copied: {item['path']} ({file_size} bytes)")
+                except Exception as e:
+                    with stats_lock:
+                        stats['errors'] += 1
+                    record_error(e)
+                    log_message(f"❌ Error creating {item.path}: {str(e)}")
+                continue
             
-            except Exception as e:
-                stats['errors'] += 1
-                log_message(f"❌ Error copying {item['path']}: {str(e)}")
+            group.append(item)
         
-        print()
+        if group:
+            add_copy(group)
+        if batch:
+            submit_copy(batch)
+        interrupted = False
+    
+    finally:
+        if interrupted:
+            COPY_ABORT.set()
+        small_pool.shutdown(cancel_futures=interrupted)
+        large_pool.shutdown(cancel_futures=interrupted)
+        add_copy_metrics(stats)
     
+    if USE_DEDUP_STORE and is_mirroring() and not is_mirror_dry_run():
+        for target_drive in get_target_drives():
+            removed, freed = prune_dedup_store(target_drive)
+            stats['objects_pruned'] += removed
+            stats['object_bytes_pruned'] += freed
+        log_message(f"Dedup store: {stats['objects_pruned']} unused objects removed", print_also=False)
+    
+    if stats['files_queued']:
+        print()
+
+def print_copy_statistics(stats):
     elapsed = time.time() - stats['start_time']
     elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
     
@@ -293,10 +2149,31 @@ def copy_missing_items(missing_items):
     print(f"Files skipped:           {stats['files_skipped']}")
     print(f"Total data copied:       {stats['total_bytes']/1024**3:.2f} GB")
     
+    if stats['delta_files']:
+        print(f"Delta-updated files:     {stats['delta_files']}")
+        print(f"Unchanged data kept:     {stats['delta_bytes_unchanged']/1024**3:.2f} GB")
+    
     if elapsed > 0 and stats['files_copied'] > 0:
         avg_speed = stats['total_bytes'] / elapsed / 1024 / 1024
         print(f"Average speed:           {avg_speed:.1f} MB/s")
     
+    if stats['dedup_linked']:
+        print(f"Linked from store:       {stats['dedup_linked']} ({stats['dedup_bytes_saved']/1024**3:.2f} GB not written)")
+    
+    if stats['files_moved']:
+        print(f"Files moved on target:   {stats['files_moved']} ({stats['moved_bytes']/1024**3:.2f} GB not copied)")
+    
+    if stats['orphans_found']:
+        if is_mirror_dry_run():
+            print(f"Only on target:          {stats['orphans_found']} (dry run - nothing deleted, see {CHECK_CSV})")
+        else:
+            print(f"Deleted from target:     {stats['orphans_deleted']}/{stats['orphans_found']}")
+            if stats['orphans_kept']:
+                print(f"Kept (source incomplete): {stats['orphans_kept']}")
+        print(f"Target-only file data:   {stats['orphan_bytes']/1024**3:.2f} GB")
+    if stats['objects_pruned']:
+        print(f"Unused objects removed:  {stats['objects_pruned']} ({stats['object_bytes_pruned']/1024**3:.2f} GB)")
+    
     print(f"Errors:                  {stats['errors']}")
     
     log_message(f"Copy complete: {stats['files_copied']} files, "
@@ -305,46 +2182,144 @@ def copy_missing_items(missing_items):
     
     return stats['errors'] == 0
 
+def copy_missing_items(missing_items):
+    
+    if not missing_items:
+        print("\n✓ No missing elements found - nothing to copy.")
+        log_message("No missing elements - copy step skipped")
+        return True
+    
+    print_header("STEP 2: COPY MISSING ELEMENTS")
+    log_message(f"START: Copy {len(missing_items)} missing elements")
+    
+    stats = new_copy_stats()
+    total_files = sum(1 for item in missing_items
+                      if item.type == 'file' and not item.orphaned and item.reason != Reason.MOVED)
+    
+    print(f"Copying {total_files} missing files...")
+    copy_items(missing_items, stats, total_files)
+    
+    return print_copy_statistics(stats)
+
 # ============================== STEP 2: COPY MISSING ITEMS ==============================
+# ============================== STEP 1+2: STREAMING PIPELINE ==============================
+
+def run_streaming_sync(scan_stats):
+    
+    print_header("STEP 1+2: COMPARE AND COPY (STREAMING)")
+    log_message("START: Streaming comparison and copy")
+    
+    scan_stats['drives_ok'] = check_drives()
+    if not scan_stats['drives_ok']:
+        return False
+    
+    print("Scanning source directory and copying missing elements...")
+    
+    stats = new_copy_stats()
+    copy_items(write_check_csv(iter_discrepancies(scan_stats)), stats)
+    
+    print_comparison_result(scan_stats)
+    
+    if scan_stats['directories'] + scan_stats['files'] + scan_stats['orphans'] == 0:
+        return True
+    
+    return print_copy_statistics(stats)
+
+# ============================== STEP 1+2: STREAMING PIPELINE ==============================
 # ============================== STEP 3: FINAL CHECK ==============================
 
-def perform_final_check():
+def verify_copied_items(missing_items):
     
-    print_header("STEP 3: FINAL COMPLETE CHECK")
-    log_message("START: Final complete check")
+    remaining_issues = []
+    checked_items = 0
+    content_checks = []
+    
+    content_pool = None
+    if VERIFY_COPIED_CONTENT and get_content_check_label():
+        content_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+    
+    for item in missing_items:
+        checked_items += 1
+        
+        if item.reason == Reason.UNREADABLE_SOURCE:
+            remaining_issues.append(f"Source not readable: {item.path or SOURCE_DRIVE}")
+            continue
+        
+        if item.orphaned:
+            if not is_mirror_dry_run() and os.path.lexists(item.target_path):
+                if not os.path.lexists(item.source_path) or os.path.isdir(item.source_path) != os.path.isdir(item.target_path):
+                    remaining_issues.append(f"Not deleted from target: {item.path}")
+            continue
+        
+        if item.type == 'directory':
+            if not os.path.isdir(item.target_path):
+                remaining_issues.append(f"Directory missing: {item.path}")
+            continue
+        
+        try:
+            source_stat = os.stat(item.source_path)
+        except OSError:
+            continue
+        
+        try:
+            target_stat = os.stat(item.target_path)
+        except OSError:
+            remaining_issues.append(f"File missing: {item.path}")
+            continue
+        
+        if source_stat.st_size != target_stat.st_size:
+            remaining_issues.append(f"Size mismatch: {item.path}")
+        elif content_pool is not None:
+            fingerprint = not USE_HASH_COMPARISON
+            content_checks.append((item.path,
+                                   content_pool.submit(get_cached_hash, item.source_path, source_stat,
+                                                       None, fingerprint, True),
+                                   content_pool.submit(get_cached_hash, item.target_path, target_stat,
+                                                       None, fingerprint, True)))
+        
+        if checked_items % PROGRESS_INTERVAL_SCAN == 0:
+            print(f"\rChecked: {checked_items} | Still missing: {len(remaining_issues)}", end="")
+    
+    for path, source_hash, target_hash in content_checks:
+        if source_hash.result() != target_hash.result():
+            remaining_issues.append(f"Content mismatch: {path}")
+    
+    if content_pool is not None:
+        content_pool.shutdown()
+    
+    return remaining_issues, checked_items
+
+def walk_final_check():
     
     source_path = Path(SOURCE_DRIVE)
-    target_path = Path(TARGET_DRIVE)
+    target_paths = [Path(target_drive) for target_drive in get_target_drives()]
     
     remaining_issues = []
     checked_items = 0
     start_time = time.time()
     
-    print("Checking if all elements are present...")
-    
     for root, dirs, files in os.walk(SOURCE_DRIVE):
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_ITEMS]
-        
         current_path = Path(root)
         relative_path = current_path.relative_to(source_path)
         
+        dirs[:] = [d for d in dirs if not is_excluded(str(relative_path / d), True)]
+        
         for dir_name in dirs:
-            if dir_name in EXCLUDE_ITEMS:
-                continue
-                
-            target_dir = target_path / relative_path / dir_name
-            if not target_dir.exists():
-                remaining_issues.append(f"Directory missing: {relative_path / dir_name}")
+            for target_path in target_paths:
+                target_dir = target_path / relative_path / dir_name
+                if not target_dir.exists():
+                    remaining_issues.append(f"Directory missing: {target_dir if len(target_paths) > 1 else relative_path / dir_name}")
             
             checked_items += 1
         
         for file_name in files:
-            if file_name in EXCLUDE_ITEMS:
+            if is_excluded(str(relative_path / file_name), False):
                 continue
             
-            target_file = target_path / relative_path / file_name
-            if not target_file.exists():
-                remaining_issues.append(f"File missing: {relative_path / file_name}")
+            for target_path in target_paths:
+                target_file = target_path / relative_path / file_name
+                if not target_file.exists():
+                    remaining_issues.append(f"File missing: {target_file if len(target_paths) > 1 else relative_path / file_name}")
             
             checked_items += 1
             
@@ -352,6 +2327,24 @@ def perform_final_check():
                 elapsed = time.time() - start_time
                 print(f"\rChecked: {checked_items} | Still missing: {len(remaining_issues)}", end="")
     
+    return remaining_issues, checked_items
+
+def perform_final_check(missing_items):
+    
+    print_header("STEP 3: FINAL COMPLETE CHECK")
+    log_message("START: Final complete check")
+    
+    start_time = time.time()
+    
+    if FULL_FINAL_CHECK:
+        print("Checking if all elements are present (full walk)...")
+        remaining_issues, checked_items = walk_final_check()
+    else:
+        print("Verifying copied elements...")
+        remaining_issues, checked_items = verify_copied_items(missing_items)
+    
+    add_metric('final_check_items', checked_items)
+    add_metric('final_check_remaining', len(remaining_issues))
     elapsed = time.time() - start_time
     elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
     
@@ -393,18 +2386,35 @@ def perform_final_check():
 # ============================== STEP 3: FINAL CHECK ==============================
 # ============================== STEP 4: SAVE RESULTS AND CREATE REPORT ==============================
 
-def save_results_and_report(missing_items, success):
+def write_check_csv(items):
+    csvfile = None
+    
+    try:
+        for item in items:
+            if csvfile is None:
+                csvfile = open(CHECK_CSV, 'w', newline='', encoding=FILE_ENCODING)
+                writer = csv.DictWriter(csvfile, fieldnames=CHECK_CSV_FIELDS)
+                writer.writeheader()
+            
+            writer.writerow(item.to_csv_row())
+            yield item
+    
+    finally:
+        if csvfile is not None:
+            csvfile.close()
+
+def read_check_csv():
+    with open(CHECK_CSV, newline='', encoding=FILE_ENCODING) as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield item_from_csv_row(row)
+
+def save_results_and_report(scan_stats, success):
     
     print_header("STEP 4: CREATE REPORT")
     
-    if missing_items:
-        with open(CHECK_CSV, 'w', newline='', encoding=FILE_ENCODING) as csvfile:
-            fieldnames = ['type', 'path', 'reason', 'size', 'source_path', 'target_path']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            writer.writerows(missing_items)
-        
+    problems_found = scan_stats['directories'] + scan_stats['files']
+    
+    if problems_found or scan_stats['orphans']:
         print(f"✓ Detailed list saved as: {CHECK_CSV}")
     
     summary_file = SUMMARY_FILE
@@ -416,21 +2426,18 @@ def save_results_and_report(missing_items, success):
         
         f.write(f"Timestamp:               {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"Source:                  {SOURCE_DRIVE}\n")
-        f.write(f"Target:                  {TARGET_DRIVE}\n")
-        f.write(f"Hash comparison:         {'YES' if USE_HASH_COMPARISON else 'NO'}\n\n")
+        f.write(f"Target:                  {', '.join(get_target_drives())}\n")
+        f.write(f"Hash comparison:         {f'YES - {get_content_check_label()}' if get_content_check_label() else 'NO'}\n\n")
         
         f.write("RESULTS:\n")
         f.write("-"*SUB_LINE_WIDTH + "\n")
         
-        if not missing_items:
+        if not problems_found:
             f.write("✅ No problems found - backup was already complete!\n")
         else:
-            dirs_count = sum(1 for item in missing_items if item['type'] == 'directory')
-            files_count = sum(1 for item in missing_items if item['type'] == 'file')
-            
-            f.write(f"Problems found:           {len(missing_items)}\n")
-            f.write(f"  • Missing directories:  {dirs_count}\n")
-            f.write(f"  • Missing/faulty files: {files_count}\n\n")
+            f.write(f"Problems found:           {problems_found}\n")
+            f.write(f"  • Missing directories:  {scan_stats['directories']}\n")
+            f.write(f"  • Missing/faulty files: {scan_stats['files']}\n\n")
             
             if success:
                 f.write("✅ All missing elements were successfully copied!\n")
@@ -439,11 +2446,20 @@ def save_results_and_report(missing_items, success):
                 f.write("⚠️  Some elements could not be copied.\n")
                 f.write("⚠️  Please check the log file for details.\n")
         
+        if DETECT_MOVES:
+            f.write(f"\nMoved on source:          {scan_stats['moves']} - renamed on target\n")
+        
+        if is_mirroring():
+            action = "reported only (dry run)" if is_mirror_dry_run() else "deleted"
+            f.write(f"\nOnly on target:           {scan_stats['orphans']} - {action}\n")
+        
         f.write("\nFILES:\n")
         f.write("-"*SUB_LINE_WIDTH + "\n")
         f.write(f"Detailed CSV list:        {CHECK_CSV}\n")
         f.write(f"Log file:                 {LOG_FILE}\n")
         f.write(f"Summary:                  {summary_file}\n")
+        if METRICS_FILE:
+            f.write(f"Metrics:                  {METRICS_FILE}\n")
         
         if os.path.exists(REMAINING_ISSUES_FILE):
             f.write(f"Missing elements:         {REMAINING_ISSUES_FILE}\n")
@@ -452,50 +2468,706 @@ def save_results_and_report(missing_items, success):
     print(f"✓ Log file: {LOG_FILE}")
 
 # ============================== STEP 4: SAVE RESULTS AND CREATE REPORT ==============================
+# ============================== WATCH MODE ==============================
+
+INOTIFY_EVENT = struct.Struct("iIII")
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_DONT_FOLLOW, IN_ISDIR = 0x4000, 0x8000, 0x1000000, 0x2000000, 0x40000000
+WATCH_EVENTS = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW
+
+FILE_NOTIFY_INFORMATION = struct.Struct("III")
+FILE_ACTION_ADDED, FILE_ACTION_MODIFIED, FILE_ACTION_RENAMED_NEW_NAME = 1, 3, 5
+FILE_NOTIFY_FILTER = 0x1 | 0x2 | 0x8 | 0x10
+
+class OVERLAPPED(ctypes.Structure):
+    _fields_ = [("Internal", ctypes.c_void_p), ("InternalHigh", ctypes.c_void_p),
+                ("Offset", ctypes.c_uint32), ("OffsetHigh", ctypes.c_uint32), ("hEvent", ctypes.c_void_p)]
+
+def open_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    
+    return {'kind': 'inotify', 'libc': libc, 'fd': fd, 'directories': {}, 'complete': True}
+
+def add_watches(watcher, relative_dir):
+    pending = [relative_dir]
+    
+    while pending:
+        current = pending.pop()
+        path = os.path.join(SOURCE_DRIVE, current)
+        wd = watcher['libc'].inotify_add_watch(watcher['fd'], os.fsencode(path), WATCH_EVENTS)
+        
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC:
+                log_message("⚠️ inotify watch limit reached (fs.inotify.max_user_watches) - falling back to polling")
+                watcher['complete'] = False
+                return False
+            continue
+        
+        watcher['directories'][wd] = current
+        for name, entry in (scan_directory(path, current) or {}).items():
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(os.path.join(current, name))
+    
+    return True
+
+def remove_watches(watcher, relative_dir):
+    prefix = relative_dir + os.sep
+    for wd, path in list(watcher['directories'].items()):
+        if path == relative_dir or path.startswith(prefix):
+            watcher['libc'].inotify_rm_watch(watcher['fd'], wd)
+            del watcher['directories'][wd]
+
+def read_inotify_events(watcher, changes, timeout):
+    readable, _, _ = select.select([watcher['fd']], [], [], timeout)
+    if not readable:
+        return 0
+    
+    data = os.read(watcher['fd'], 64 * 1024)
+    offset = 0
+    found = 0
+    
+    while offset < len(data):
+        wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+        name = os.fsdecode(data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0"))
+        offset += INOTIFY_EVENT.size + length
+        
+        if mask & IN_Q_OVERFLOW:
+            log_message("⚠️ inotify queue overflow - comparing the whole source", print_also=False)
+            changes[""] = True
+            found += 1
+            continue
+        
+        if mask & IN_IGNORED:
+            watcher['directories'].pop(wd, None)
+            continue
+        
+        relative_dir = watcher['directories'].get(wd)
+        if relative_dir is None:
+            continue
+        
+        relative_path = os.path.join(relative_dir, name)
+        is_directory = bool(mask & IN_ISDIR)
+        if is_excluded(relative_path, is_directory):
+            continue
+        
+        changes.setdefault(relative_dir, False)
+        found += 1
+        
+        if is_directory and mask & IN_MOVED_FROM:
+            remove_watches(watcher, relative_path)
+        elif is_directory and mask & (IN_CREATE | IN_MOVED_TO):
+            changes[relative_path] = True
+            add_watches(watcher, relative_path)
+    
+    return found
+
+def open_directory_watch():
+    if os.name != "nt":
+        return None
+    
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateFileW.restype = kernel32.CreateEventW.restype = ctypes.c_void_p
+    kernel32.CreateFileW.argtypes = [ctypes.c_wchar_p, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_void_p,
+                                     ctypes.c_uint32, ctypes.c_uint32, ctypes.c_void_p]
+    kernel32.CreateEventW.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_wchar_p]
+    kernel32.ReadDirectoryChangesW.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int,
+                                               ctypes.c_uint32, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+    kernel32.WaitForSingleObject.restype = ctypes.c_uint32
+    kernel32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+    kernel32.GetOverlappedResult.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]
+    kernel32.ResetEvent.argtypes = kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+    kernel32.CancelIoEx.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    
+    handle = kernel32.CreateFileW(SOURCE_DRIVE, 0x1, 0x7, None, 3, 0x02000000 | 0x40000000, None)
+    if handle is None or handle == ctypes.c_void_p(-1).value:
+        return None
+    
+    watcher = {'kind': 'windows', 'kernel32': kernel32, 'handle': handle, 'pending': False, 'complete': True,
+               'overlapped': OVERLAPPED(hEvent=kernel32.CreateEventW(None, True, False, None)),
+               'buffer': ctypes.create_string_buffer(64 * 1024)}
+    if not start_directory_read(watcher):
+        close_watcher(watcher)
+        return None
+    return watcher
+
+def start_directory_read(watcher):
+    kernel32 = watcher['kernel32']
+    kernel32.ResetEvent(watcher['overlapped'].hEvent)
+    watcher['pending'] = bool(kernel32.ReadDirectoryChangesW(
+        watcher['handle'], watcher['buffer'], len(watcher['buffer']), True, FILE_NOTIFY_FILTER,
+        None, ctypes.byref(watcher['overlapped']), None))
+    return watcher['pending']
+
+def read_directory_changes(watcher, changes, timeout):
+    kernel32 = watcher['kernel32']
+    deadline = None if timeout is None else time.monotonic() + timeout
+    
+    while True:
+        wait = 0.5 if deadline is None else min(0.5, max(0.0, deadline - time.monotonic()))
+        if kernel32.WaitForSingleObject(watcher['overlapped'].hEvent, int(wait * 1000)) == 0:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            return 0
+    
+    size = ctypes.c_uint32()
+    ok = kernel32.GetOverlappedResult(watcher['handle'], ctypes.byref(watcher['overlapped']), ctypes.byref(size), False)
+    data = watcher['buffer'].raw[:size.value] if ok else b""
+    
+    if not start_directory_read(watcher):
+        log_message("⚠️ Change notifications stopped - falling back to polling")
+        watcher['complete'] = False
+    
+    if not data:
+        log_message("⚠️ Change notification overflow - comparing the whole source", print_also=False)
+        changes[""] = True
+        return 1
+    
+    offset = 0
+    found = 0
+    while True:
+        next_offset, action, length = FILE_NOTIFY_INFORMATION.unpack_from(data, offset)
+        start = offset + FILE_NOTIFY_INFORMATION.size
+        relative_path = data[start:start + length].decode("utf-16-le")
+        
+        is_directory = os.path.isdir(os.path.join(SOURCE_DRIVE, relative_path))
+        parts = relative_path.split(os.sep)
+        excluded = any(is_excluded(os.sep.join(parts[:depth]), depth < len(parts) or is_directory)
+                       for depth in range(1, len(parts) + 1))
+        
+        if not excluded and not (is_directory and action == FILE_ACTION_MODIFIED):
+            changes.setdefault(os.path.dirname(relative_path), False)
+            found += 1
+            if is_directory and action in (FILE_ACTION_ADDED, FILE_ACTION_RENAMED_NEW_NAME):
+                changes[relative_path] = True
+        
+        if not next_offset:
+            return found
+        offset += next_offset
+
+def close_watcher(watcher):
+    if watcher['kind'] == 'inotify':
+        os.close(watcher['fd'])
+        return
+    
+    kernel32 = watcher['kernel32']
+    if watcher['pending']:
+        kernel32.CancelIoEx(watcher['handle'], ctypes.byref(watcher['overlapped']))
+        kernel32.GetOverlappedResult(watcher['handle'], ctypes.byref(watcher['overlapped']),
+                                     ctypes.byref(ctypes.c_uint32()), True)
+    kernel32.CloseHandle(watcher['handle'])
+    kernel32.CloseHandle(watcher['overlapped'].hEvent)
+
+def get_folder_signature(entries):
+    signature = []
+    for name, entry in entries.items():
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                signature.append((name, -1, 0))
+            else:
+                file_stat = entry.stat(follow_symlinks=False)
+                signature.append((name, file_stat.st_size, file_stat.st_mtime_ns))
+        except OSError:
+            signature.append((name, -2, 0))
+    return hash(frozenset(signature))
+
+def add_polled_directories(folders, relative_dir):
+    pending = [relative_dir]
+    
+    while pending:
+        current = pending.pop()
+        entries = scan_directory(os.path.join(SOURCE_DRIVE, current), current)
+        if entries is None:
+            continue
+        folders[current] = get_folder_signature(entries)
+        for name, entry in entries.items():
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(os.path.join(current, name))
+
+def poll_directory_changes(folders, changes):
+    found = 0
+    
+    for relative_dir, signature in list(folders.items()):
+        entries = scan_directory(os.path.join(SOURCE_DRIVE, relative_dir), relative_dir)
+        
+        if entries is None:
+            del folders[relative_dir]
+            continue
+        
+        current = get_folder_signature(entries)
+        if current == signature:
+            continue
+        
+        folders[relative_dir] = current
+        changes.setdefault(relative_dir, False)
+        found += 1
+        
+        for name, entry in entries.items():
+            path = os.path.join(relative_dir, name)
+            if entry.is_dir(follow_symlinks=False) and path not in folders:
+                add_polled_directories(folders, path)
+                changes[path] = True
+    
+    return found
+
+def sync_changes(changes):
+    
+    def covered(relative_dir):
+        while relative_dir:
+            relative_dir = os.path.dirname(relative_dir)
+            if changes.get(relative_dir):
+                return True
+        return False
+    
+    roots = {relative_dir: recursive for relative_dir, recursive in changes.items()
+             if not covered(relative_dir) and os.path.isdir(os.path.join(SOURCE_DRIVE, relative_dir))}
+    if not roots:
+        return True
+    
+    start_time = time.time()
+    scan_stats = new_scan_stats()
+    stats = new_copy_stats()
+    
+    try:
+        copy_items(iter_discrepancies(scan_stats, roots), stats)
+    finally:
+        close_hash_cache()
+    
+    synced = scan_stats['directories'] + scan_stats['files'] + scan_stats['orphans']
+    if synced:
+        log_message(f"Synced {synced} changes in {len(roots)} folders: {stats['files_copied']} files copied, "
+                    f"{stats['errors']} errors ({time.time() - start_time:.1f}s)")
+    return stats['errors'] == 0
+
+def watch_source():
+    
+    print_header("WATCH MODE")
+    
+    watcher = open_inotify()
+    if watcher is not None and not add_watches(watcher, ""):
+        close_watcher(watcher)
+        watcher = None
+    if watcher is None:
+        watcher = open_directory_watch()
+    
+    folders = None
+    if watcher is None:
+        folders = {}
+        add_polled_directories(folders, "")
+        log_message(f"Watching {SOURCE_DRIVE} by polling {len(folders)} folders every {WATCH_POLL_INTERVAL:g}s")
+        if len(folders) > 1000:
+            log_message(f"⚠️ Polling {len(folders)} folders costs a full scan every {WATCH_POLL_INTERVAL:g}s - "
+                        f"raise WATCH_POLL_INTERVAL or use a system with change notifications")
+    elif watcher['kind'] == 'inotify':
+        log_message(f"Watching {SOURCE_DRIVE} with inotify ({len(watcher['directories'])} folders)")
+    else:
+        log_message(f"Watching {SOURCE_DRIVE} with ReadDirectoryChangesW")
+    print("Press Ctrl+C to stop.")
+    
+    changes = {}
+    first_change = last_change = None
+    next_full_scan = time.time() + WATCH_FULL_SCAN_HOURS * 3600 if WATCH_FULL_SCAN_HOURS else float('inf')
+    success = True
+    
+    try:
+        while True:
+            due = next_full_scan
+            if changes:
+                due = min(due, last_change + WATCH_SETTLE_SECONDS, first_change + WATCH_MAX_DELAY_SECONDS)
+            timeout = max(0.0, due - time.time())
+            
+            if watcher is not None:
+                read_events = read_inotify_events if watcher['kind'] == 'inotify' else read_directory_changes
+                found = read_events(watcher, changes, None if timeout == float('inf') else timeout)
+            else:
+                time.sleep(min(timeout, WATCH_POLL_INTERVAL))
+                found = poll_directory_changes(folders, changes)
+            
+            now = time.time()
+            if found:
+                last_change = now
+                first_change = first_change or now
+            
+            if watcher is not None and not watcher['complete']:
+                close_watcher(watcher)
+                watcher = None
+                folders = {}
+                add_polled_directories(folders, "")
+                changes[""] = True
+            
+            if now >= next_full_scan:
+                log_message("Watch mode: full comparison", print_also=False)
+                changes = {"": True}
+                next_full_scan = now + WATCH_FULL_SCAN_HOURS * 3600
+            elif not changes or (now - last_change < WATCH_SETTLE_SECONDS and now - first_change < WATCH_MAX_DELAY_SECONDS):
+                continue
+            
+            batch, changes = changes, {}
+            first_change = last_change = None
+            success = sync_changes(batch)
+    
+    except KeyboardInterrupt:
+        log_message("Watch mode stopped by user (Ctrl+C)")
+    
+    finally:
+        if watcher is not None:
+            close_watcher(watcher)
+    
+    return success
+
+# ============================== WATCH MODE ==============================
+# ============================== BENCHMARKS ==============================
+
+def benchmark_hash_algorithms(file_path=None):
+    
+    print_header("HASH BENCHMARK")
+    
+    temp_file = None
+    if file_path is None:
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".bin")
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(HASH_BENCHMARK_SIZE_MB):
+            temp_file.write(chunk)
+        temp_file.close()
+        file_path = temp_file.name
+    
+    size_mb = os.path.getsize(file_path) / 1024 / 1024
+    print(f"Test file:   {file_path} ({size_mb:.0f} MB)")
+    print(f"Buffer size: {HASH_BUFFER_SIZE // 1024} KB")
+    print("-"*SUB_LINE_WIDTH)
+    
+    algorithms = ["md5", "sha1", "sha256", "sha512", "blake2b", "blake2s"]
+    if xxhash is not None:
+        algorithms += ["xxh64", "xxh3_64", "xxh3_128"]
+    else:
+        print("(xxhash not installed - xxh64/xxh3 skipped)")
+    
+    try:
+        get_file_hash(file_path, "md5")
+        
+        for algorithm in algorithms:
+            start = time.perf_counter()
+            get_file_hash(file_path, algorithm)
+            elapsed = time.perf_counter() - start
+            print(f"{algorithm:<12} {size_mb / elapsed:10.1f} MB/s")
+    finally:
+        if temp_file is not None:
+            os.remove(file_path)
+
+def benchmark_record_memory(count=None):
+    count = count or RECORD_BENCHMARK_COUNT
+    
+    print_header("RECORD MEMORY BENCHMARK")
+    print(f"Items:       {count}")
+    print("-"*SUB_LINE_WIDTH)
+    
+    def old_dict_item(i):
+        path = os.path.join("Projects", f"Folder{i // 100}", f"Video_{i:08d}.mp4")
+        return {
+            'type': 'file',
+            'path': path,
+            'source_path': os.path.join(SOURCE_DRIVE, path),
+            'target_path': os.path.join(get_target_drives()[0], path),
+            'reason': f'Size mismatch ({i * 1000} vs {i} bytes)',
+            'size': i * 1000
+        }
+    
+    def compact_item(i):
+        path = os.path.join("Projects", f"Folder{i // 100}", f"Video_{i:08d}.mp4")
+        return MissingItem(path, Reason.SIZE_MISMATCH, i * 1000, i)
+    
+    results = {}
+    for label, factory in (("dict", old_dict_item), ("MissingItem", compact_item)):
+        tracemalloc.start()
+        items = [factory(i) for i in range(count)]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del items
+        
+        results[label] = current
+        print(f"{label:<12} {current / 1024**2:10.1f} MB  ({current / count:.0f} bytes/item)")
+    
+    print(f"Reduction:   {(1 - results['MissingItem'] / results['dict']) * 100:.1f}%")
+
+def benchmark_scan(directory=None):
+    
+    print_header("SCAN BENCHMARK")
+    
+    temp_dir = None
+    if directory is None:
+        temp_dir = directory = tempfile.mkdtemp(prefix="copysync-scan-")
+        print(f"Creating {SCAN_BENCHMARK_FILES} files...")
+        for index in range(SCAN_BENCHMARK_FILES):
+            folder = os.path.join(temp_dir, f"{index // 5000:03d}", f"{index // 50 % 100:02d}")
+            if index % 50 == 0:
+                os.makedirs(folder, exist_ok=True)
+            open(os.path.join(folder, f"file_{index}.dat"), 'wb').close()
+    
+    settings = {'SOURCE_DRIVE': directory, 'TARGET_DRIVE': directory, 'USE_INCREMENTAL_SCAN': False,
+                'USE_HASH_COMPARISON': False, 'USE_QUICK_FINGERPRINT': False, 'USE_DEDUP_STORE': False,
+                'MIRROR_MODE': False, 'SNAPSHOT_MODE': False, 'DETECT_MOVES': False, 'PROGRESS_INTERVAL_SCAN': float('inf')}
+    saved = {name: globals()[name] for name in list(settings) + ['SCAN_WORKERS']}
+    print(f"Folder:      {directory}")
+    print("Note: repeated passes are served from the OS cache - network shares show the real gain")
+    print("-"*SUB_LINE_WIDTH)
+    
+    try:
+        configure(**settings)
+        for workers in (1, 2, 4, 8, 16):
+            configure(scan_workers=workers)
+            scan_stats = new_scan_stats()
+            start = time.perf_counter()
+            for _ in iter_discrepancies(scan_stats):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>2} workers  {scan_stats['scanned'] / elapsed:12.0f} entries/s  ({elapsed:.2f}s)")
+    finally:
+        configure(**saved)
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir)
+
+def benchmark_copy_methods(file_path=None):
+    
+    print_header("COPY BENCHMARK")
+    
+    temp_file = None
+    if file_path is None:
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".bin")
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(COPY_BENCHMARK_SIZE_MB):
+            temp_file.write(chunk)
+        temp_file.close()
+        file_path = temp_file.name
+    
+    size_mb = os.path.getsize(file_path) / 1024 / 1024
+    target_path = f"{file_path}.copytest"
+    print(f"Test file:   {file_path} ({size_mb:.0f} MB)")
+    print(f"Chunk size:  {COPY_CHUNK_SIZE // 1024 // 1024} MB")
+    print("-"*SUB_LINE_WIDTH)
+    
+    try:
+        get_file_hash(file_path, "md5")
+        
+        for method in ("copy2", "auto", "sendfile", "readwrite"):
+            start = time.perf_counter()
+            used = copy_file_data(file_path, target_path, method=method)
+            with open(target_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            elapsed = time.perf_counter() - start
+            os.remove(target_path)
+            label = method if used == method else f"{method} ({used})"
+            print(f"{label:<28} {size_mb / elapsed:10.1f} MB/s")
+    finally:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        if temp_file is not None:
+            os.remove(file_path)
+
+# ============================== BENCHMARKS ==============================
+# ============================== COMMAND LINE ==============================
+
+def configure(**settings):
+    for name, value in settings.items():
+        if name.upper() not in CONFIG_NAMES:
+            raise ValueError(f"Unknown setting: {name}")
+        globals()[name.upper()] = value
+
+def parse_setting(assignment):
+    name, separator, value = assignment.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got '{assignment}'")
+    if name.strip().upper() not in CONFIG_NAMES:
+        raise argparse.ArgumentTypeError(f"unknown setting '{name.strip()}'")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return name.strip(), value
+
+def parse_time_window(window):
+    start, separator, end = window.partition("-")
+    try:
+        if not separator:
+            raise ValueError(window)
+        return tuple(time.strftime("%H:%M", time.strptime(value.strip(), "%H:%M")) for value in (start, end))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HH:MM-HH:MM, got '{window}'")
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a source folder with one or more backup targets and copy what is missing.")
+    parser.add_argument("-s", "--source", help=f"source folder (default: {SOURCE_DRIVE})")
+    parser.add_argument("-t", "--target", action="append", help="target folder, repeat to write to several targets")
+    parser.add_argument("-x", "--exclude", action="append", default=[], metavar="PATTERN", help="additional gitignore-style pattern to skip, repeatable")
+    parser.add_argument("--exclude-from", action="append", default=[], metavar="FILE", help="read exclude patterns from a file (one per line, # comments)")
+    parser.add_argument("--hash", choices=("off", "full", "fingerprint"), help="content check of files with equal size")
+    parser.add_argument("--hash-algorithm", help=f"hash algorithm (default: {HASH_ALGORITHM})")
+    parser.add_argument("-w", "--workers", type=int, help=f"copy threads for small files (default: {COPY_WORKERS})")
+    parser.add_argument("--large-workers", type=int, help=f"copy threads for large files (default: {LARGE_FILE_WORKERS})")
+    parser.add_argument("--hash-workers", type=int, help=f"hashing threads (default: {HASH_WORKERS})")
+    parser.add_argument("--mirror", action="store_true", help="report items that only exist on the target")
+    parser.add_argument("--delete", action="store_true", help="delete items that only exist on the target (implies --mirror)")
+    parser.add_argument("--snapshot", action="store_true", help="back up into a new dated snapshot folder")
+    parser.add_argument("--watch", action="store_true", help="keep running and sync changes of the source as they happen")
+    parser.add_argument("--read-limit", type=float, metavar="MBPS", help="limit reading the source to MB/s")
+    parser.add_argument("--write-limit", type=float, metavar="MBPS", help="limit writing the targets to MB/s")
+    parser.add_argument("--limit-hours", action="append", type=parse_time_window, metavar="HH:MM-HH:MM", help="apply the limits only in this time window, repeatable")
+    parser.add_argument("--low-priority", action="store_true", help="run at background CPU and I/O priority")
+    parser.add_argument("-o", "--output-dir", help="folder for CSV, log, summary and databases - use one per concurrent job")
+    parser.add_argument("--set", action="append", type=parse_setting, default=[], metavar="NAME=VALUE",
+                        help="override any configuration constant, e.g. --set COPY_QUEUE_SIZE=5000")
+    parser.add_argument("-y", "--non-interactive", action="store_true", help="do not wait for Enter at the end (cron, task scheduler)")
+    
+    benchmarks = parser.add_mutually_exclusive_group()
+    benchmarks.add_argument("--benchmark-hash", nargs="?", const="", metavar="FILE", help="measure the hash algorithms instead of running a backup")
+    benchmarks.add_argument("--benchmark-records", action="store_true", help="measure the memory of the discrepancy records")
+    benchmarks.add_argument("--benchmark-copy", nargs="?", const="", metavar="FILE", help="compare the copy methods with shutil.copy2")
+    benchmarks.add_argument("--benchmark-scan", nargs="?", const="", metavar="DIR", help="measure the tree walk with 1-16 scan workers")
+    return parser.parse_args(argv)
+
+def settings_from_arguments(args):
+    settings = dict(args.set)
+    
+    if args.source:
+        settings['SOURCE_DRIVE'] = args.source
+    if args.target:
+        settings['TARGET_DRIVE'] = args.target if len(args.target) > 1 else args.target[0]
+    for exclude_file in args.exclude_from:
+        with open(exclude_file, encoding=FILE_ENCODING) as f:
+            args.exclude.extend(line.rstrip("\n") for line in f)
+    if args.exclude:
+        settings['EXCLUDE_ITEMS'] = EXCLUDE_ITEMS + args.exclude
+    if args.hash:
+        settings['USE_HASH_COMPARISON'] = args.hash == "full"
+        settings['USE_QUICK_FINGERPRINT'] = args.hash == "fingerprint"
+    
+    for option, name in (('hash_algorithm', 'HASH_ALGORITHM'), ('workers', 'COPY_WORKERS'),
+                         ('large_workers', 'LARGE_FILE_WORKERS'), ('hash_workers', 'HASH_WORKERS')):
+        if getattr(args, option) is not None:
+            settings[name] = getattr(args, option)
+    
+    if args.mirror or args.delete:
+        settings['MIRROR_MODE'] = True
+    if args.delete:
+        settings['MIRROR_DRY_RUN'] = False
+    if args.snapshot:
+        settings['SNAPSHOT_MODE'] = True
+    if args.watch:
+        settings['WATCH_MODE'] = True
+    if args.read_limit is not None:
+        settings['READ_LIMIT_MBPS'] = args.read_limit
+    if args.write_limit is not None:
+        settings['WRITE_LIMIT_MBPS'] = args.write_limit
+    if args.limit_hours:
+        settings['LIMIT_SCHEDULE'] = args.limit_hours
+    if args.low_priority:
+        settings['LOW_PRIORITY'] = True
+    
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name in OUTPUT_FILES:
+            file_name = settings.get(name, globals()[name])
+            if file_name:
+                settings[name] = os.path.join(args.output_dir, os.path.basename(file_name))
+    
+    return settings
+
+# ============================== COMMAND LINE ==============================
 # ============================== MAIN FUNCTION - PROCESS CONTROL ==============================
 
-def main():
+def run_backup(**settings):
+    saved = {name: globals()[name] for name in CONFIG_NAMES}
+    try:
+        configure(**settings)
+        return perform_backup()
+    finally:
+        configure(**saved)
+
+def perform_backup():
+    
+    SNAPSHOT_ROOTS.clear()
+    SNAPSHOT_BASES.clear()
     
     if os.path.exists(LOG_FILE):
         old_log = f"{LOG_FILE}.{time.strftime(LOG_BACKUP_TIMESTAMP_FORMAT)}.bak"
         os.rename(LOG_FILE, old_log)
         log_message(f"Old log file renamed to: {old_log}", print_also=False)
     
+    if LOW_PRIORITY:
+        lower_process_priority()
+    
     print_header("BACKUP AUTOMATION STARTING")
     print(f"Source:      {SOURCE_DRIVE}")
-    print(f"Target:      {TARGET_DRIVE}")
-    print(f"Hash check:  {'Enabled' if USE_HASH_COMPARISON else 'Disabled'}")
+    print(f"Target:      {', '.join(get_target_drives())}")
+    print(f"Hash check:  {f'Enabled - {get_content_check_label()}' if get_content_check_label() else 'Disabled'}")
     print(f"Log file:    {LOG_FILE}")
     print("="*SUMMARY_LINE_WIDTH)
     
     total_start_time = time.time()
+    scan_stats = new_scan_stats()
+    watch = WATCH_MODE
+    reset_metrics()
     
     try:
-        missing_items = perform_complete_comparison()
+        get_bandwidth_limits()
+        
+        phase_start = total_start_time
+        if SNAPSHOT_MODE:
+            prepare_snapshots()
+            phase_start = scan_stats['start_time'] = record_phase('snapshot', phase_start)
+        
+        if STREAMING_PIPELINE:
+            copy_success = run_streaming_sync(scan_stats)
+            phase_start = record_phase('scan_and_copy', phase_start)
+        else:
+            missing_items = perform_complete_comparison(scan_stats)
+            phase_start = record_phase('scan', phase_start)
+            copy_success = copy_missing_items(missing_items)
+            phase_start = record_phase('copy', phase_start)
         
-        if not missing_items:
+        if not scan_stats['drives_ok']:
+            success = False
+        elif scan_stats['directories'] + scan_stats['files'] + scan_stats['orphans'] == 0:
             print("\n" + "✅" * 35)
             print("✅ EVERYTHING ALREADY COMPLETE - NOTHING TO DO!")
             print("✅" * 35)
             
             success = True
         else:
-            copy_success = copy_missing_items(missing_items)
-            final_check_success = perform_final_check()
+            final_check_success = perform_final_check(read_check_csv() if STREAMING_PIPELINE else missing_items)
+            phase_start = record_phase('final_check', phase_start)
             success = copy_success and final_check_success
         
-        save_results_and_report(missing_items, success)
+        save_results_and_report(scan_stats, success)
+        record_phase('report', phase_start)
         
     except KeyboardInterrupt:
         log_message("❌ ABORTED by user (Ctrl+C)")
         print("\n\n❌ Process was aborted by user!")
         success = False
+        watch = False
     
     except Exception as e:
         log_message(f"❌ UNKNOWN ERROR: {str(e)}")
         print(f"\n\n❌ An unexpected error occurred: {e}")
         success = False
     
+    close_scan_index(success)
+    close_hash_cache()
+    
+    if SNAPSHOT_MODE and SNAPSHOT_KEEP and success:
+        prune_snapshots()
+    
+    record_phase('total', total_start_time)
+    write_metrics(scan_stats, success)
+    
     total_time = time.time() - total_start_time
     total_time_str = time.strftime('%H:%M:%S', time.gmtime(total_time))
     
@@ -514,10 +3186,40 @@ def main():
         print("⚠️ " * 18)
         print("\nPlease check the log file for details!")
     
-    input("\nPress Enter to exit...")
+    if watch and scan_stats['drives_ok']:
+        success = watch_source()
+    
+    stop_log_writer()
+    return success
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    configure(**settings_from_arguments(args))
+    
+    if args.benchmark_hash is not None:
+        benchmark_hash_algorithms(args.benchmark_hash or None)
+        return 0
+    if args.benchmark_records:
+        benchmark_record_memory()
+        return 0
+    if args.benchmark_copy is not None:
+        benchmark_copy_methods(args.benchmark_copy or None)
+        return 0
+    if args.benchmark_scan is not None:
+        benchmark_scan(args.benchmark_scan or None)
+        return 0
+    
+    success = run_backup()
+    
+    if not args.non_interactive and sys.stdin is not None and sys.stdin.isatty():
+        input("\nPress Enter to exit...")
+    
+    return 0 if success else 1
 
 # ============================== MAIN FUNCTION - PROCESS CONTROL ==============================
 # ============================== PROGRAM START ==============================
 
+atexit.register(stop_log_writer)
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())